@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks the vectorized separable convolution used by `numpy_model` against
+the previous implementation, which convolved each channel separately with
+`np.convolve` and evaluated one input at a time, using randomly generated inputs
+and kernels with the shapes of the set and cycle model layers. The outputs of
+both implementations are also compared.
+
+Copyright (c) 2021 Matthew Petroff
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import argparse
+import time
+import numpy as np
+import numpy_model
+
+
+def loop_conv(x, w):
+    return np.sum(x * w.T[0][..., np.newaxis], axis=1)
+
+
+def loop_depthwise_conv(x, w):
+    return np.array([np.convolve(x[j], w[j, 0], "same") for j in range(w.shape[0])])
+
+
+def loop_separable_conv(x, depthwise_kernel, pointwise_kernel):
+    return np.array(
+        [
+            loop_conv(loop_depthwise_conv(i, depthwise_kernel), pointwise_kernel)
+            for i in x
+        ]
+    )
+
+
+def vectorized_separable_conv(x, depthwise_kernel, pointwise_kernel):
+    return numpy_model.conv(
+        numpy_model.depthwise_conv(x, depthwise_kernel), pointwise_kernel
+    )
+
+
+def time_function(func, *args, repeat=3):
+    """
+    Returns the output of the function and the best time over several runs.
+    """
+    best = np.inf
+    for _ in range(repeat):
+        t = time.time()
+        output = func(*args)
+        best = min(best, time.time() - t)
+    return output, best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark vectorized separable convolution against loops.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--batch-size", default=10000, type=int, help="Batch size")
+    parser.add_argument("--num-colors", default=8, type=int, help="Input length")
+    parser.add_argument(
+        "--channels", default=5, type=int, help="Number of input channels"
+    )
+    parser.add_argument(
+        "--out-channels", default=3, type=int, help="Number of output channels"
+    )
+    parser.add_argument("--width", default=5, type=int, help="Kernel width")
+    args = parser.parse_args()
+    if args.num_colors < args.width:
+        # `np.convolve` returns the kernel width instead of the input length
+        parser.error("--num-colors must be at least --width")
+
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal(
+        (args.batch_size, args.channels, args.num_colors), dtype=np.float32
+    )
+    depthwise_kernel = rng.standard_normal(
+        (args.channels, 1, args.width), dtype=np.float32
+    )
+    pointwise_kernel = rng.standard_normal(
+        (args.channels, args.out_channels, 1), dtype=np.float32
+    )
+
+    loop_output, loop_time = time_function(
+        loop_separable_conv, x, depthwise_kernel, pointwise_kernel
+    )
+    vec_output, vec_time = time_function(
+        vectorized_separable_conv, x, depthwise_kernel, pointwise_kernel
+    )
+
+    print(f"loop:       {loop_time:.4f} s")
+    print(f"vectorized: {vec_time:.4f} s ({loop_time / vec_time:.1f}x faster)")
+    print(f"max difference: {np.max(np.abs(loop_output - vec_output)):.2e}")
@@ -29,6 +29,28 @@ import h5py
 
 ENSEMBLE_COUNT = 100
 
+
+def save_stacked_weights(weights, dirname):
+    """
+    Saves the weights of all ensemble members as an uncompressed `.npy` file for
+    each layer weight, named `{layer}_{name}.npy`, e.g., `3j_depthwise_kernel.npy`,
+    so they can be memory-mapped. Each file stacks the members along a new first
+    axis, so its shape is `(ENSEMBLE_COUNT,)` followed by the member shape, e.g.,
+    `(100, 3, 5)` for `1j_kernel.npy`.
+    """
+    os.makedirs(dirname, exist_ok=True)
+    names = set()
+    for key in weights:
+        if key != "ensemble_count":
+            layer, _, name = key.split("_", 2)
+            names.add((layer, name))
+    for layer, name in sorted(names):
+        stacked = np.stack(
+            [weights[f"{layer}_{i:03d}_{name}"] for i in range(ENSEMBLE_COUNT)]
+        )
+        np.save(os.path.join(dirname, f"{layer}_{name}.npy"), stacked)
+
+
 # Set model
 weights = {"ensemble_count": ENSEMBLE_COUNT}
 for i in range(ENSEMBLE_COUNT):
@@ -55,6 +77,7 @@ for i in range(ENSEMBLE_COUNT):
             weights[key[1:] + f"_{i:03d}_pointwise_kernel"] = pointwise_kernel
             weights[key[1:] + f"_{i:03d}_bias"] = bias
 
+save_stacked_weights(weights, "set_model_weights")
 npz_filename = "set_model_weights.npz"
 np.savez(npz_filename, **weights)
 # Recompressing the NPZ file reduces its file size considerably since it contains
@@ -91,6 +114,7 @@ for i in range(ENSEMBLE_COUNT):
             weights[key[1:] + f"_{i:03d}_pointwise_kernel"] = pointwise_kernel
             weights[key[1:] + f"_{i:03d}_bias"] = bias
 
+save_stacked_weights(weights, "cycle_model_weights")
 npz_filename = "cycle_model_weights.npz"
 np.savez(npz_filename, **weights)
 # Recompressing the NPZ file reduces its file size considerably since it contains
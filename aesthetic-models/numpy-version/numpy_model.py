@@ -1,15 +1,86 @@
 import gzip
+import itertools
+import os
 import numpy as np
 import colorspacious
 
 
+def hex_to_rgb(colors):
+    """
+    Converts hex color codes (without `#`) to sRGB255; shape=(..., 3).
+    """
+    # Codes longer than six characters keep a seventh character, while shorter
+    # codes are padded with null bytes, which are not hex digits
+    colors = np.asarray(colors, dtype="S7")
+    digits = np.frombuffer(colors.tobytes(), dtype=np.uint8)
+    digits = digits.reshape(colors.shape + (7,))
+    lower = digits[..., :6] | 0x20
+    is_digit = (digits[..., :6] >= ord("0")) & (digits[..., :6] <= ord("9"))
+    is_letter = (lower >= ord("a")) & (lower <= ord("f"))
+    valid = np.all(is_digit | is_letter, axis=-1) & (digits[..., 6] == 0)
+    if not np.all(valid):
+        code = colors[~valid][0].decode()
+        raise ValueError(f"Invalid hex color code: {code}")
+    # ASCII `0`-`9` are 0x30-0x39, while `a`-`f` and `A`-`F` are 0x61-0x66 and
+    # 0x41-0x46, so the low four bits, plus nine for letters, give the values
+    digits = digits[..., :6]
+    values = (digits & 0xF) + 9 * (digits >> 6)
+    return (values[..., 0::2] << 4 | values[..., 1::2]).astype(np.uint8)
+
+
+# Each cache is cleared once adding new colors would exceed this many colors, to
+# keep memory use bounded
+CACHE_LIMIT = 2 ** 20
+
+
+class JabCache(object):
+    """
+    Converts sRGB255 colors to CAM02-UCS, only converting colors that have not
+    been seen before, which are kept sorted by 24-bit RGB value.
+    """
+
+    def __init__(self, limit=CACHE_LIMIT):
+        self.limit = limit
+        self.keys = np.empty(0, dtype=np.uint32)
+        self.jab = np.empty((0, 3))
+
+    def __call__(self, rgb):
+        rgb = np.asarray(rgb, dtype=np.uint32)
+        keys = rgb[..., 0] << 16 | rgb[..., 1] << 8 | rgb[..., 2]
+        unique, inverse = np.unique(keys, return_inverse=True)
+        idx = np.searchsorted(self.keys, unique)
+        found = idx < self.keys.size
+        found[found] = self.keys[idx[found]] == unique[found]
+        missing = unique[~found]
+        if self.keys.size + missing.size > self.limit:
+            # Clear the cache, so all colors of this call are converted again
+            self.keys = self.keys[:0]
+            self.jab = self.jab[:0]
+            missing = unique
+        if missing.size > 0:
+            missing_rgb = np.stack(
+                [missing >> 16, missing >> 8 & 0xFF, missing & 0xFF], axis=-1
+            )
+            missing_jab = colorspacious.cspace_convert(
+                missing_rgb, "sRGB255", "CAM02-UCS"
+            )
+            # Missing colors are sorted, so inserting each of them before the
+            # first larger cached color keeps the cache sorted
+            pos = np.searchsorted(self.keys, missing)
+            self.keys = np.insert(self.keys, pos, missing)
+            self.jab = np.insert(self.jab, pos, missing_jab, axis=0)
+            idx = np.searchsorted(self.keys, unique)
+        return self.jab[idx][inverse.reshape(rgb.shape[:-1])]
+
+
+JAB_CACHE = JabCache()
+
+
 def to_jab(color):
     """
     Convert hex color code (without `#`) to CAM02-UCS.
     """
-    rgb = [(int(i[:2], 16), int(i[2:4], 16), int(i[4:], 16)) for i in color]
-    jab = colorspacious.cspace_convert(rgb, "sRGB255", "CAM02-UCS")
-    return jab.astype(np.float32)
+    return JAB_CACHE(hex_to_rgb(color)).astype(np.float32)
 
 
 def sort_colors_by_j(colors):
@@ -33,16 +104,66 @@ def sort_colors_by_b(colors):
     return colors[np.argsort(colors[:, ::-1].T[2])]
 
 
+def sort_sets_by_j(sets):
+    """
+    Sorts colors in each set by CAM02-UCS J' axis; shape=(num_sets, num_colors, 3).
+    """
+    idx = np.lexsort(np.moveaxis(sets[..., ::-1], -1, 0), axis=-1)
+    return np.take_along_axis(sets, idx[..., np.newaxis], axis=1)
+
+
+def sort_sets_by_a(sets):
+    """
+    Sorts colors in each set by CAM02-UCS a' axis; shape=(num_sets, num_colors, 3).
+    """
+    idx = np.argsort(sets[..., ::-1][..., 1], axis=-1)
+    return np.take_along_axis(sets, idx[..., np.newaxis], axis=1)
+
+
+def sort_sets_by_b(sets):
+    """
+    Sorts colors in each set by CAM02-UCS b' axis; shape=(num_sets, num_colors, 3).
+    """
+    # Uses the same column indexing as `sort_colors_by_b`, so the models see the
+    # same inputs as they did during training
+    idx = np.argsort(sets[..., ::-1][..., 2], axis=-1)
+    return np.take_along_axis(sets, idx[..., np.newaxis], axis=1)
+
+
 # The next four functions are based on functions in:
 # https://github.com/keras-team/keras/blob/2.3.0/keras/backend/numpy_backend.py
+# The convolutions are vectorized, so they also work on batches of inputs with
+# shape (..., channels, length) and on kernels stacked along leading axes.
 
 
 def conv(x, w):
-    return np.sum(x * w.T[0][..., np.newaxis], axis=1)
+    """
+    Pointwise convolution; w.shape=(..., in_channels, out_channels, 1).
+    """
+    return np.matmul(np.swapaxes(w[..., 0], -1, -2), x)
 
 
 def depthwise_conv(x, w):
-    return np.array([np.convolve(x[j], w[j, 0], "same") for j in range(w.shape[0])])
+    """
+    Depthwise convolution, with zero padding to keep the same length, i.e., the
+    same as `np.convolve` with mode "same" for each channel if the length is at
+    least the kernel width; w.shape=(..., channels, 1, width). For shorter
+    inputs, `np.convolve` instead returns the kernel width, while this returns
+    the input length, as Keras does.
+    """
+    width = w.shape[-1]
+    length = x.shape[-1]
+    padded = np.zeros(x.shape[:-1] + (length + width - 1,), x.dtype)
+    padded[..., width // 2 : width // 2 + length] = x
+    # Overlapping windows of the padded input, as a view without copying
+    windows = np.lib.stride_tricks.as_strided(
+        padded,
+        shape=x.shape + (width,),
+        strides=padded.strides + padded.strides[-1:],
+        writeable=False,
+    )
+    # Flip kernel, since convolution (unlike correlation) flips it
+    return np.matmul(windows, np.swapaxes(w[..., ::-1], -1, -2))[..., 0]
 
 
 def elu(x):
@@ -59,7 +180,7 @@ class Dense(object):
         self.bias = bias
 
     def __call__(self, inputs):
-        outputs = np.dot(inputs, self.kernel)
+        outputs = np.matmul(inputs, self.kernel)
         outputs += self.bias
         return elu(outputs)
 
@@ -77,149 +198,355 @@ class SeparableConv1D(object):
         return elu(outputs)
 
 
+# The following two layers evaluate all ensemble members at once, using weights
+# stacked along a leading ensemble axis, on batches of inputs. Inputs and outputs
+# have shape (ensemble_count, batch, num_colors, channels) for the dense layer
+# and (ensemble_count, batch, channels, num_colors) for the convolution layer.
+# The stacked weights are only reshaped, without copying, so memory-mapped
+# weights stay memory-mapped.
+
+
+class DenseEnsemble(Dense):
+    def __init__(self, kernel, bias):
+        super().__init__(kernel[:, np.newaxis], bias[:, np.newaxis, np.newaxis])
+
+
+class SeparableConv1DEnsemble(SeparableConv1D):
+    def __init__(self, depthwise_kernel, pointwise_kernel, bias):
+        super().__init__(
+            depthwise_kernel[:, np.newaxis],
+            pointwise_kernel[:, np.newaxis],
+            bias[:, np.newaxis],
+        )
+
+
+def load_weights(filename):
+    """
+    Loads model weights, stacked along a leading ensemble axis and keyed by layer
+    and weight name, e.g., `1j_kernel`. `filename` is either a directory with an
+    uncompressed `.npy` file for each stacked weight, which are memory-mapped, or
+    a gzipped `.npz` file with separate arrays for each ensemble member.
+    """
+    if os.path.isdir(filename):
+        return {
+            f[:-4]: np.load(os.path.join(filename, f), mmap_mode="r")
+            for f in sorted(os.listdir(filename))
+            if f.endswith(".npy")
+        }
+    with gzip.open(filename, "rb") as infile:
+        weight_file = dict(np.load(infile))
+    stacked = {}
+    for i in range(weight_file.pop("ensemble_count")):
+        for key, weight in weight_file.items():
+            layer, member, name = key.split("_", 2)
+            if member == f"{i:03d}":
+                stacked.setdefault(f"{layer}_{name}", []).append(weight)
+    return {key: np.stack(weights) for key, weights in stacked.items()}
+
+
+def load_ensemble_layers(weights, dense_keys, conv_keys):
+    """
+    Creates ensemble layers from stacked model weights.
+    """
+    layers = {}
+    for key in dense_keys:
+        layers[key] = DenseEnsemble(weights[key + "_kernel"], weights[key + "_bias"])
+    for key in conv_keys:
+        layers[key] = SeparableConv1DEnsemble(
+            weights[key + "_depthwise_kernel"],
+            weights[key + "_pointwise_kernel"],
+            weights[key + "_bias"],
+        )
+    return layers
+
+
+def slice_ensemble_layers(layers, members):
+    """
+    Selects a slice of ensemble members from ensemble layers, without copying.
+    """
+    sliced = {}
+    for key, layer in layers.items():
+        if isinstance(layer, Dense):
+            sliced[key] = Dense(layer.kernel[members], layer.bias[members])
+        else:
+            sliced[key] = SeparableConv1D(
+                layer.depthwise_kernel[members],
+                layer.pointwise_kernel[members],
+                layer.bias[members],
+            )
+    return sliced
+
+
+def sequential_decision(
+    score_members,
+    num_items,
+    ensemble_count,
+    threshold=None,
+    top_k=None,
+    tolerance=0.0,
+    z=3.0,
+    step=10,
+):
+    """
+    Decides which items have a mean ensemble score of at least `threshold`, or
+    which items are among the `top_k` items with the highest mean ensemble
+    scores, without necessarily evaluating all ensemble members.
+
+    Ensemble members are evaluated in order, `step` at a time, and an item is no
+    longer evaluated once its decision is settled by a confidence interval, of
+    `z` standard errors, on its mean score over the full ensemble (including a
+    finite-population correction, so the interval vanishes once all members are
+    evaluated). Items within `tolerance` of the threshold, or of the boundary of
+    the top K, count as settled either way, so with a nonzero tolerance slightly
+    more or fewer than `top_k` items can be selected.
+    `score_members(items, members)` must return the scores of the items with the
+    given indices for the given slice of ensemble members, with shape
+    (num_members, num_items).
+
+    Returns estimated mean scores, decisions, and the number of ensemble members
+    evaluated for each item, each with shape (num_items,).
+    """
+    if (threshold is None) == (top_k is None):
+        raise ValueError("Exactly one of `threshold` and `top_k` must be given")
+    sums = np.zeros(num_items)
+    sums_sq = np.zeros(num_items)
+    counts = np.zeros(num_items, dtype=int)
+    active = np.arange(num_items)
+    for start in range(0, ensemble_count, step):
+        scores = score_members(active, slice(start, start + step))
+        scores = scores.astype(np.float64)
+        sums[active] += np.sum(scores, axis=0)
+        sums_sq[active] += np.sum(scores ** 2, axis=0)
+        counts[active] += scores.shape[0]
+
+        # Confidence interval on mean score of full ensemble
+        means = sums / counts
+        variances = np.maximum(sums_sq - counts * means ** 2, 0) / np.maximum(
+            counts - 1, 1
+        )
+        correction = (ensemble_count - counts) / max(ensemble_count - 1, 1)
+        half_widths = z * np.sqrt(variances / counts * correction)
+        lower = means - half_widths
+        upper = means + half_widths
+
+        if threshold is not None:
+            above = lower >= threshold - tolerance
+            below = upper <= threshold + tolerance
+        else:
+            # Number of other items that could be, or certainly are, ranked higher
+            could_be_higher = (
+                num_items
+                - np.searchsorted(np.sort(upper), lower + tolerance, "right")
+                - (upper > lower + tolerance)
+            )
+            certainly_higher = (
+                num_items
+                - np.searchsorted(np.sort(lower), upper - tolerance, "right")
+                - (lower > upper - tolerance)
+            )
+            above = could_be_higher < top_k
+            below = certainly_higher >= top_k
+        active = np.flatnonzero(~(above | below))
+        if active.size == 0:
+            break
+
+    # Fall back to point estimates for any items that are no longer settled
+    if threshold is not None:
+        estimates = means >= threshold
+    else:
+        estimates = np.zeros(num_items, dtype=bool)
+        estimates[np.argsort(-means, kind="stable")[:top_k]] = True
+    decisions = np.where(above | below, above, estimates)
+    return means, decisions, counts
+
+
 class SetModel(object):
     def __init__(self, filename):
         # Load model weights
-        layers = []
-        with gzip.open(filename, "rb") as infile:
-            weight_file = np.load(infile)
-            for i in range(weight_file["ensemble_count"]):
-                layers.append({})
-                for key in ["1j", "2j", "1a", "2a", "1b", "2b"]:
-                    kernel = weight_file[key + f"_{i:03d}_kernel"]
-                    bias = weight_file[key + f"_{i:03d}_bias"]
-                    layers[i][key] = Dense(kernel, bias)
-                for key in ["3j", "4j", "5j", "3a", "4a", "5a", "3b", "4b", "5b"]:
-                    depthwise_kernel = weight_file[key + f"_{i:03d}_depthwise_kernel"]
-                    pointwise_kernel = weight_file[key + f"_{i:03d}_pointwise_kernel"]
-                    bias = weight_file[key + f"_{i:03d}_bias"]
-                    layers[i][key] = SeparableConv1D(
-                        depthwise_kernel, pointwise_kernel, bias
-                    )
-        self.all_layers = layers
+        weights = load_weights(filename)
+        self.ensemble_count = weights["1j_kernel"].shape[0]
+        self.ensemble_layers = load_ensemble_layers(
+            weights,
+            ["1j", "2j", "1a", "2a", "1b", "2b"],
+            ["3j", "4j", "5j", "3a", "4a", "5a", "3b", "4b", "5b"],
+        )
 
     @staticmethod
-    def _eval_ensemble_instance(layers, input_a):
+    def _eval_ensemble(layers, inputs):
         """
-        layers: dict with callable layers
-        input_a: [colors sorted by J', colors sorted by a', colors sorted by b']; shape=(3 * num_colors,)
+        layers: dict with callable ensemble layers
+        inputs: [sets sorted by J', sets sorted by a', sets sorted by b']; shape=(num_sets, num_colors, 3)
+        returns: scores; shape=(ensemble_count, num_sets)
         """
-        num_colors = input_a[0].shape[0] // 3
+        outputs = []
+        for axis, x in zip("jab", inputs):
+            # Share layers between colors
+            x = layers["1" + axis](x[np.newaxis] / 100)
+            x = layers["2" + axis](x)
 
-        # Create network
-        inputs_a_j = [input_a[0][i * 3 : (i + 1) * 3] for i in range(num_colors)]
-        inputs_a_a = [input_a[1][i * 3 : (i + 1) * 3] for i in range(num_colors)]
-        inputs_a_b = [input_a[2][i * 3 : (i + 1) * 3] for i in range(num_colors)]
+            # Share layers between color sets
+            x = np.swapaxes(x, -1, -2)
+            x = layers["3" + axis](x)
+            x = layers["4" + axis](x)
+            x = layers["5" + axis](x)
 
-        # Share layers between colors
-        x_a_j = [layers["1j"](i / 100) for i in inputs_a_j]
-        x_a_a = [layers["1a"](i / 100) for i in inputs_a_a]
-        x_a_b = [layers["1b"](i / 100) for i in inputs_a_b]
-
-        x_a_j = [layers["2j"](i) for i in x_a_j]
-        x_a_a = [layers["2a"](i) for i in x_a_a]
-        x_a_b = [layers["2b"](i) for i in x_a_b]
-
-        # Combine colors into sets
-        x_a_j = np.vstack(x_a_j).T
-        x_a_a = np.vstack(x_a_a).T
-        x_a_b = np.vstack(x_a_b).T
-
-        # Share layers between color sets
-        x_a_j = layers["3j"](x_a_j)
-        x_a_a = layers["3a"](x_a_a)
-        x_a_b = layers["3b"](x_a_b)
-
-        x_a_j = layers["4j"](x_a_j)
-        x_a_a = layers["4a"](x_a_a)
-        x_a_b = layers["4b"](x_a_b)
-
-        x_a_j = layers["5j"](x_a_j)
-        x_a_a = layers["5a"](x_a_a)
-        x_a_b = layers["5b"](x_a_b)
-
-        # Average outputs
-        x_a_j = np.mean(x_a_j)
-        x_a_a = np.mean(x_a_a)
-        x_a_b = np.mean(x_a_b)
-
-        # Final non-linear activation
-        x_a_j = sigmoid(x_a_j)
-        x_a_a = sigmoid(x_a_a)
-        x_a_b = sigmoid(x_a_b)
+            # Average outputs and apply final non-linear activation
+            outputs.append(sigmoid(np.mean(x, axis=(-2, -1))))
 
         # Final averaging of sub-ensemble
-        return np.mean([x_a_j, x_a_a, x_a_b])
+        return np.mean(outputs, axis=0)
 
-    def __call__(self, rgb_colors, average=True):
-        jab = to_jab(rgb_colors)
-        sorted_by_j = sort_colors_by_j(jab).flatten()
-        sorted_by_a = sort_colors_by_a(jab).flatten()
-        sorted_by_b = sort_colors_by_b(jab).flatten()
-        inputs = (sorted_by_j, sorted_by_a, sorted_by_b)
-        scores = np.array(
-            [SetModel._eval_ensemble_instance(l, inputs) for l in self.all_layers]
-        )
+    def score_many(self, sets, average=True, chunk_size=1000):
+        """
+        Scores many color sets at once, evaluating all ensemble members with a
+        few batched operations. `sets` is a sequence of color sets with the same
+        number of colors, each given as hex color codes (without `#`). Sets are
+        evaluated in chunks of `chunk_size` to bound memory use. Returns mean
+        scores with shape (num_sets,), or, if `average` is False, the scores of
+        each ensemble member with shape (num_sets, ensemble_count).
+        """
+        sets = list(sets)
+        jab = to_jab([c for s in sets for c in s]).reshape((len(sets), -1, 3))
+        scores = []
+        for start in range(0, len(sets), chunk_size):
+            chunk = jab[start : start + chunk_size]
+            inputs = (
+                sort_sets_by_j(chunk),
+                sort_sets_by_a(chunk),
+                sort_sets_by_b(chunk),
+            )
+            scores.append(SetModel._eval_ensemble(self.ensemble_layers, inputs).T)
+        scores = np.concatenate(scores)
         if average:
-            return np.mean(scores)
+            return np.mean(scores, axis=1)
         return scores
 
+    def select_many(self, sets, chunk_size=1000, **kwargs):
+        """
+        Selects color sets with a mean score of at least `threshold`, or the
+        `top_k` color sets with the highest mean scores, evaluating ensemble
+        members only until each decision is settled; see `sequential_decision`
+        for the keyword arguments. `sets` is as for `score_many`. Returns
+        estimated mean scores, whether each set was selected, and the number of
+        ensemble members evaluated for each set.
+        """
+        sets = list(sets)
+        jab = to_jab([c for s in sets for c in s]).reshape((len(sets), -1, 3))
+        inputs = (sort_sets_by_j(jab), sort_sets_by_a(jab), sort_sets_by_b(jab))
+
+        def score_members(items, members):
+            layers = slice_ensemble_layers(self.ensemble_layers, members)
+            scores = []
+            for start in range(0, items.size, chunk_size):
+                chunk = items[start : start + chunk_size]
+                scores.append(
+                    SetModel._eval_ensemble(layers, [x[chunk] for x in inputs])
+                )
+            return np.concatenate(scores, axis=1)
+
+        return sequential_decision(
+            score_members, len(sets), self.ensemble_count, **kwargs
+        )
+
+    def __call__(self, rgb_colors, average=True):
+        return self.score_many([rgb_colors], average, chunk_size=1)[0]
+
 
 class CycleModel(object):
     def __init__(self, filename):
         # Load model weights
-        layers = []
-        with gzip.open(filename, "rb") as infile:
-            weight_file = np.load(infile)
-            for i in range(weight_file["ensemble_count"]):
-                layers.append({})
-                for key in ["1", "2"]:
-                    kernel = weight_file[key + f"_{i:03d}_kernel"]
-                    bias = weight_file[key + f"_{i:03d}_bias"]
-                    layers[i][key] = Dense(kernel, bias)
-                for key in ["3", "4", "5"]:
-                    depthwise_kernel = weight_file[key + f"_{i:03d}_depthwise_kernel"]
-                    pointwise_kernel = weight_file[key + f"_{i:03d}_pointwise_kernel"]
-                    bias = weight_file[key + f"_{i:03d}_bias"]
-                    layers[i][key] = SeparableConv1D(
-                        depthwise_kernel, pointwise_kernel, bias
-                    )
-        self.all_layers = layers
+        weights = load_weights(filename)
+        self.ensemble_count = weights["1_kernel"].shape[0]
+        self.ensemble_layers = load_ensemble_layers(
+            weights, ["1", "2"], ["3", "4", "5"]
+        )
 
     @staticmethod
-    def _eval_ensemble_instance(layers, input_a):
+    def _embed_colors(layers, inputs):
         """
-        layers: dict with callable layers
-        input_a: color cycle; shape=(3 * num_colors,)
+        layers: dict with callable ensemble layers
+        inputs: colors; shape=(num_colors, 3)
+        returns: per-color outputs of shared layers; shape=(ensemble_count, num_colors, 5)
         """
-        num_colors = input_a.shape[0] // 3
-
-        # Create network
-        inputs_a = [input_a[i * 3 : (i + 1) * 3] for i in range(num_colors)]
-
         # Share layers between colors
-        x_a = [layers["1"](i / 100) for i in inputs_a]
-        x_a = [layers["2"](i) for i in x_a]
-
-        # Combine colors into sets
-        x_a = np.vstack(x_a).T
+        x = layers["1"](inputs[np.newaxis, np.newaxis] / 100)
+        return layers["2"](x)[:, 0]
 
-        # Share layers between color sets
-        x_a = layers["3"](x_a)
-        x_a = layers["4"](x_a)
-        x_a = layers["5"](x_a)
-
-        # Average outputs
-        x_a = np.mean(x_a)
+    @staticmethod
+    def _eval_ensemble(layers, inputs):
+        """
+        layers: dict with callable ensemble layers
+        inputs: per-color outputs of shared layers for color cycles; shape=(ensemble_count, num_cycles, num_colors, 5)
+        returns: scores; shape=(ensemble_count, num_cycles)
+        """
+        # Share layers between color cycles
+        x = np.swapaxes(inputs, -1, -2)
+        x = layers["3"](x)
+        x = layers["4"](x)
+        x = layers["5"](x)
+
+        # Average outputs and apply final non-linear activation
+        return sigmoid(np.mean(x, axis=(-2, -1)))
+
+    def score_permutations(
+        self, rgb_colors, perms=None, average=True, chunk_size=1000
+    ):
+        """
+        Scores many orderings of a color set at once. `rgb_colors` are hex color
+        codes (without `#`), and `perms` is an integer array of orderings, with
+        shape (num_perms, cycle_length), that index into `rgb_colors`; if it is
+        not given, all permutations are scored. The colors are only converted,
+        and passed through the per-color layers, once, and the orderings are
+        evaluated in chunks of `chunk_size` to bound memory use. Returns mean
+        scores with shape (num_perms,), or, if `average` is False, the scores
+        of each ensemble member with shape (num_perms, ensemble_count).
+        """
+        jab = to_jab(rgb_colors)
+        # Since the first two layers are applied to each color independently of
+        # its position, they only need to be evaluated once for each color
+        embedded = CycleModel._embed_colors(self.ensemble_layers, jab)
+        if perms is None:
+            perms = np.array(list(itertools.permutations(range(len(rgb_colors)))))
+        perms = np.asarray(perms)
+        scores = np.empty((perms.shape[0], self.ensemble_count), dtype=np.float32)
+        for start in range(0, perms.shape[0], chunk_size):
+            inputs = embedded[:, perms[start : start + chunk_size]]
+            scores[start : start + chunk_size] = CycleModel._eval_ensemble(
+                self.ensemble_layers, inputs
+            ).T
+        if average:
+            return np.mean(scores, axis=1)
+        return scores
 
-        # Final non-linear activation
-        return sigmoid(x_a)
+    def select_permutations(self, rgb_colors, perms=None, chunk_size=1000, **kwargs):
+        """
+        Selects orderings of a color set with a mean score of at least
+        `threshold`, or the `top_k` orderings with the highest mean scores,
+        evaluating ensemble members only until each decision is settled; see
+        `sequential_decision` for the keyword arguments. `rgb_colors` and
+        `perms` are as for `score_permutations`. Returns estimated mean scores,
+        whether each ordering was selected, and the number of ensemble members
+        evaluated for each ordering.
+        """
+        jab = to_jab(rgb_colors)
+        if perms is None:
+            perms = np.array(list(itertools.permutations(range(len(rgb_colors)))))
+        perms = np.asarray(perms)
+
+        def score_members(items, members):
+            layers = slice_ensemble_layers(self.ensemble_layers, members)
+            embedded = CycleModel._embed_colors(layers, jab)
+            scores = []
+            for start in range(0, items.size, chunk_size):
+                inputs = embedded[:, perms[items[start : start + chunk_size]]]
+                scores.append(CycleModel._eval_ensemble(layers, inputs))
+            return np.concatenate(scores, axis=1)
+
+        return sequential_decision(
+            score_members, perms.shape[0], self.ensemble_count, **kwargs
+        )
 
     def __call__(self, rgb_colors, average=True):
-        jab = to_jab(rgb_colors).flatten()
-        scores = np.array(
-            [CycleModel._eval_ensemble_instance(l, jab) for l in self.all_layers]
-        )
-        if average:
-            return np.mean(scores)
-        return scores
+        return self.score_permutations(
+            rgb_colors, [range(len(rgb_colors))], average, chunk_size=1
+        )[0]
@@ -0,0 +1,8 @@
+"""
+Makes `numpy_model` importable when running the tests from any directory.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,259 @@
+"""
+Tests for the NumPy model implementation, against straightforward references.
+"""
+
+import itertools
+import os
+import numpy as np
+import pytest
+import colorspacious
+import numpy_model
+
+MODEL_DIR = os.path.dirname(os.path.abspath(numpy_model.__file__))
+
+
+def reference_depthwise_conv(x, w):
+    """
+    Convolves each channel of a single input separately, with zero padding to
+    keep the same length; w.shape=(channels, 1, width).
+    """
+    width = w.shape[-1]
+    out = np.zeros(x.shape)
+    for c in range(x.shape[0]):
+        for t in range(x.shape[1]):
+            for k in range(width):
+                i = t + width // 2 - k
+                if 0 <= i < x.shape[1]:
+                    out[c, t] += w[c, 0, k] * x[c, i]
+    return out
+
+
+@pytest.mark.parametrize("length", [1, 2, 4, 5, 8, 12])
+def test_depthwise_conv(length):
+    rng = np.random.default_rng(length)
+    x = rng.standard_normal((6, 5, length))
+    w = rng.standard_normal((5, 1, 5))
+    out = numpy_model.depthwise_conv(x, w)
+    assert out.shape == x.shape
+    for i in range(x.shape[0]):
+        expected = reference_depthwise_conv(x[i], w)
+        np.testing.assert_allclose(out[i], expected, rtol=1e-12, atol=1e-12)
+        if length >= w.shape[-1]:
+            # Same as the previous `np.convolve` implementation
+            np.testing.assert_allclose(
+                out[i],
+                [np.convolve(x[i, c], w[c, 0], "same") for c in range(5)],
+                rtol=1e-12,
+                atol=1e-12,
+            )
+
+
+def test_conv():
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((6, 5, 8))
+    w = rng.standard_normal((5, 3, 1))
+    expected = [np.sum(i * w.T[0][..., np.newaxis], axis=1) for i in x]
+    np.testing.assert_allclose(numpy_model.conv(x, w), expected, rtol=1e-12)
+
+
+def test_jab_cache():
+    rng = np.random.default_rng(0)
+    cache = numpy_model.JabCache(limit=500)
+    for i in range(20):
+        # Include repeated colors, within and across calls
+        rgb = rng.integers(0, 64, (30, 7, 3)) * 4
+        jab = cache(rgb)
+        expected = colorspacious.cspace_convert(rgb, "sRGB255", "CAM02-UCS")
+        np.testing.assert_allclose(jab, expected, rtol=1e-12, atol=1e-12)
+        assert cache.keys.size <= 500
+        assert np.all(np.diff(cache.keys.astype(np.int64)) > 0)
+        assert cache.jab.shape == (cache.keys.size, 3)
+
+
+def test_to_jab():
+    codes = ["ff0000", "00FF00", "0000ff", "ff0000"]
+    expected = colorspacious.cspace_convert(
+        [[255, 0, 0], [0, 255, 0], [0, 0, 255], [255, 0, 0]], "sRGB255", "CAM02-UCS"
+    )
+    np.testing.assert_allclose(numpy_model.to_jab(codes), expected, rtol=1e-6)
+    with pytest.raises(ValueError):
+        numpy_model.to_jab(["ff000"])
+
+
+def weights_path(filename):
+    return os.path.join(MODEL_DIR, filename)
+
+
+@pytest.fixture(scope="module")
+def separate_weights():
+    return {
+        name: numpy_model.load_weights(weights_path(f"{name}_model_weights.npz.gz"))
+        for name in ("set", "cycle")
+    }
+
+
+def member_layers(weights, member, dense_keys, conv_keys):
+    """
+    Creates the layers of a single ensemble member.
+    """
+    layers = {}
+    for key in dense_keys:
+        layers[key] = numpy_model.Dense(
+            weights[key + "_kernel"][member], weights[key + "_bias"][member]
+        )
+    for key in conv_keys:
+        layers[key] = numpy_model.SeparableConv1D(
+            weights[key + "_depthwise_kernel"][member],
+            weights[key + "_pointwise_kernel"][member],
+            weights[key + "_bias"][member],
+        )
+    return layers
+
+
+def reference_set_score(layers, jab):
+    """
+    Scores a single color set with a single ensemble member, one color at a time.
+    """
+    outputs = []
+    sorts = (
+        numpy_model.sort_colors_by_j,
+        numpy_model.sort_colors_by_a,
+        numpy_model.sort_colors_by_b,
+    )
+    for axis, sort in zip("jab", sorts):
+        x = [layers["2" + axis](layers["1" + axis](c / 100)) for c in sort(jab)]
+        x = np.vstack(x).T
+        for key in "345":
+            x = layers[key + axis](x)
+        outputs.append(numpy_model.sigmoid(np.mean(x)))
+    return np.mean(outputs)
+
+
+def reference_cycle_score(layers, jab):
+    """
+    Scores a single color cycle with a single ensemble member, one color at a
+    time.
+    """
+    x = np.vstack([layers["2"](layers["1"](c / 100)) for c in jab]).T
+    for key in "345":
+        x = layers[key](x)
+    return numpy_model.sigmoid(np.mean(x))
+
+
+SET_DENSE_KEYS = ["1j", "2j", "1a", "2a", "1b", "2b"]
+SET_CONV_KEYS = ["3j", "4j", "5j", "3a", "4a", "5a", "3b", "4b", "5b"]
+
+
+def random_hex_sets(num_sets, num_colors, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        ["%06x" % c for c in rng.integers(0, 2 ** 24, num_colors)]
+        for _ in range(num_sets)
+    ]
+
+
+def test_set_model_score_many(separate_weights):
+    model = numpy_model.SetModel(weights_path("set_model_weights"))
+    weights = separate_weights["set"]
+    sets = random_hex_sets(5, 6)
+    scores = model.score_many(sets, average=False, chunk_size=2)
+    assert scores.shape == (5, model.ensemble_count)
+    for member in range(model.ensemble_count):
+        layers = member_layers(weights, member, SET_DENSE_KEYS, SET_CONV_KEYS)
+        for i, s in enumerate(sets):
+            expected = reference_set_score(layers, numpy_model.to_jab(s))
+            assert scores[i, member] == pytest.approx(expected, rel=1e-5)
+    np.testing.assert_allclose(model.score_many(sets), np.mean(scores, axis=1))
+    assert model(sets[3]) == pytest.approx(np.mean(scores[3]), rel=1e-6)
+
+
+def test_cycle_model_score_permutations(separate_weights):
+    model = numpy_model.CycleModel(weights_path("cycle_model_weights"))
+    weights = separate_weights["cycle"]
+    colors = random_hex_sets(1, 4, seed=1)[0]
+    jab = numpy_model.to_jab(colors)
+    perms = list(itertools.permutations(range(4)))
+    scores = model.score_permutations(colors, average=False, chunk_size=7)
+    assert scores.shape == (len(perms), model.ensemble_count)
+    for member in range(model.ensemble_count):
+        layers = member_layers(weights, member, ["1", "2"], ["3", "4", "5"])
+        for i, perm in enumerate(perms):
+            expected = reference_cycle_score(layers, jab[list(perm)])
+            assert scores[i, member] == pytest.approx(expected, rel=1e-5)
+    # Only scores the given orderings, which may repeat colors
+    perms = [[3, 1, 0, 2], [0, 0, 1, 1, 2]]
+    for perm in perms:
+        expected = model.score_permutations(
+            [colors[i] for i in perm], [range(len(perm))]
+        )
+        assert model.score_permutations(colors, [perm]) == pytest.approx(expected)
+    assert model(colors) == pytest.approx(np.mean(scores[0]), rel=1e-6)
+
+
+def test_weight_formats_match(separate_weights):
+    for name, separate in separate_weights.items():
+        stacked = numpy_model.load_weights(weights_path(f"{name}_model_weights"))
+        assert sorted(stacked) == sorted(separate)
+        for key, weight in stacked.items():
+            assert isinstance(weight, np.memmap)
+            assert weight.dtype == separate[key].dtype
+            np.testing.assert_array_equal(weight, separate[key])
+
+
+def sequential_decision_scores(num_items=300, ensemble_count=100, seed=0):
+    """
+    Random member scores, with shape (ensemble_count, num_items), and a function
+    that returns them as `sequential_decision` expects, counting evaluations.
+    """
+    rng = np.random.default_rng(seed)
+    means = rng.uniform(0.2, 0.8, num_items)
+    scores = np.clip(
+        means + 0.1 * rng.standard_normal((ensemble_count, num_items)), 0, 1
+    )
+    evaluated = np.zeros(num_items, dtype=int)
+
+    def score_members(items, members):
+        evaluated[items] += scores[members].shape[0]
+        return scores[members][:, items]
+
+    return scores, score_members, evaluated
+
+
+def test_sequential_decision_threshold():
+    scores, score_members, evaluated = sequential_decision_scores()
+    means, decisions, counts = numpy_model.sequential_decision(
+        score_members, scores.shape[1], scores.shape[0], threshold=0.5
+    )
+    np.testing.assert_array_equal(decisions, np.mean(scores, axis=0) >= 0.5)
+    np.testing.assert_array_equal(counts, evaluated)
+    assert np.mean(counts) < 0.5 * scores.shape[0]
+    # Fully evaluated items have exact means
+    full = counts == scores.shape[0]
+    np.testing.assert_allclose(means[full], np.mean(scores[:, full], axis=0))
+
+
+def test_sequential_decision_top_k():
+    scores, score_members, evaluated = sequential_decision_scores()
+    means, decisions, counts = numpy_model.sequential_decision(
+        score_members, scores.shape[1], scores.shape[0], top_k=20
+    )
+    expected = np.zeros(scores.shape[1], dtype=bool)
+    expected[np.argsort(-np.mean(scores, axis=0))[:20]] = True
+    np.testing.assert_array_equal(decisions, expected)
+    np.testing.assert_array_equal(counts, evaluated)
+    assert np.mean(counts) < 0.5 * scores.shape[0]
+    with pytest.raises(ValueError):
+        numpy_model.sequential_decision(score_members, 10, 100)
+
+
+def test_select_many_matches_score_many():
+    model = numpy_model.SetModel(weights_path("set_model_weights"))
+    sets = random_hex_sets(40, 5, seed=2)
+    scores = model.score_many(sets)
+    threshold = np.median(scores)
+    means, decisions, counts = model.select_many(
+        sets, chunk_size=16, threshold=threshold
+    )
+    np.testing.assert_array_equal(decisions, scores >= threshold)
+    full = counts == model.ensemble_count
+    np.testing.assert_allclose(means[full], scores[full], rtol=1e-6)
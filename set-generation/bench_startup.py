@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks startup latency of the Numba kernels, i.e., the time taken by the
+first call of each kernel, which includes compiling it or loading it from the
+on-disk kernel cache. The kernels are first run in a fresh process with an empty
+cache directory (cold start) and then in further fresh processes that reuse the
+now-populated cache (warm start). Small synthetic color tables are used, so the
+timings are dominated by compilation instead of by the actual work.
+
+Copyright (c) 2021 Matthew Petroff
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def run_child():
+    """
+    Times the first call of each kernel and prints the timings as JSON.
+    """
+    timings = {}
+
+    t = time.time()
+    import numpy as np
+    import color_conversions
+    import spatial_index
+    from set_generation import generator, sequential
+
+    timings["import"] = time.time() - t
+
+    # Coarse grid of RGB colors, including white
+    rgb_colors = np.array(
+        [
+            (r, g, b)
+            for b in range(0, 256, 17)
+            for g in range(0, 256, 17)
+            for r in range(0, 256, 17)
+        ],
+        dtype=np.uint8,
+    )
+    rgb_linear = color_conversions.sRGB1_to_sRGB1_linear(
+        rgb_colors.flatten() / 255
+    ).reshape((-1, 3))
+
+    t = time.time()
+    jab = color_conversions.rgb_linear_to_jab(rgb_linear[0])
+    color_conversions.jab_to_rgb_linear(jab)
+    timings["conversions"] = time.time() - t
+
+    t = time.time()
+    jab_colors = color_conversions.rgb_linear_to_jab_parallel(rgb_linear).astype(
+        np.float32
+    )
+    timings["conversions_parallel"] = time.time() - t
+
+    t = time.time()
+    cvd_jab_colors = [
+        np.array(
+            [
+                color_conversions.rgb_linear_to_jab(
+                    color_conversions.CVD_forward(c, cvd_type, 100)
+                )
+                for c in rgb_linear
+            ],
+            dtype=np.float32,
+        )
+        for cvd_type in (
+            color_conversions.DEUTERANOMALY,
+            color_conversions.PROTANOMALY,
+            color_conversions.TRITANOMALY,
+        )
+    ]
+    timings["cvd_conversions"] = time.time() - t
+
+    t = time.time()
+    tables = generator.ColorTables(
+        rgb_colors,
+        jab_colors,
+        *cvd_jab_colors,
+        np.empty(0, dtype=np.float32),
+        generator.build_rgb_index(rgb_colors),
+        spatial_index.build_sorted_index(np.ascontiguousarray(jab_colors[:, 0])),
+        *[spatial_index.build_grid(c, 20.0) for c in [jab_colors] + cvd_jab_colors],
+    )
+    timings["indices"] = time.time() - t
+
+    t = time.time()
+    params = generator.SetParams(
+        4, 20.0, 4.0, 40.0, 90.0, -40.0, 40.0, -40.0, 40.0, False, False
+    )
+    colors = None
+    seed = 0
+    while colors is None:
+        colors = generator.gen_color_set(seed, tables, params)
+        seed += 1
+    generator.check_color_set(colors, generator.severity_schedule(100), 20.0)
+    timings["gen_color_set"] = time.time() - t
+
+    cvd_severity = 2
+    all_severities = [
+        np.array(
+            [
+                [
+                    color_conversions.rgb_linear_to_jab(
+                        color_conversions.CVD_forward(c, cvd_type, s)
+                    )
+                    for s in range(1, cvd_severity + 1)
+                ]
+                for c in rgb_linear
+            ],
+            dtype=np.float32,
+        )
+        for cvd_type in (
+            color_conversions.DEUTERANOMALY,
+            color_conversions.PROTANOMALY,
+            color_conversions.TRITANOMALY,
+        )
+    ]
+    t = time.time()
+    # Tables contain every severity, so no linear RGB colors are needed
+    sequential.gen_cycle(
+        rgb_colors, jab_colors, *all_severities, 3, np.empty((0, 3)), cvd_severity
+    )
+    timings["gen_cycle"] = time.time() - t
+
+    print(json.dumps(timings))
+
+
+def run_parent(num_warm):
+    """
+    Runs the benchmark in fresh processes with a fresh kernel cache.
+    """
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir)
+        runs = []
+        for i in range(num_warm + 1):
+            t = time.time()
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child"],
+                env=env,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                check=True,
+                stdout=subprocess.PIPE,
+                universal_newlines=True,
+            ).stdout
+            timings = json.loads(output.strip().splitlines()[-1])
+            timings["total"] = time.time() - t
+            runs.append(timings)
+
+    print(f"{'kernel':>22} {'cold (s)':>10} {'warm (s)':>10}")
+    for key in runs[0]:
+        warm = min(run[key] for run in runs[1:])
+        print(f"{key:>22} {runs[0][key]:10.3f} {warm:10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark cold and warm startup latency of the Numba kernels.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--num-warm", default=3, type=int, help="Number of warm-start runs"
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child()
+    else:
+        run_parent(args.num_warm)
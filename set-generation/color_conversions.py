@@ -28,6 +28,7 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import functools
 import numpy as np
 import numba
 
@@ -36,7 +37,7 @@ import numba
 #
 
 
-@numba.njit
+@numba.njit(cache=True)
 def sRGB1_linear_to_sRGB1(sRGB1_linear):
     out = sRGB1_linear.copy()
     linear_portion = sRGB1_linear <= 0.0031308
@@ -46,7 +47,7 @@ def sRGB1_linear_to_sRGB1(sRGB1_linear):
     return out
 
 
-@numba.njit
+@numba.njit(cache=True)
 def sRGB1_to_sRGB1_linear(sRGB1):
     """Convert sRGB (as floats in the 0-to-1 range) to linear sRGB."""
     out = sRGB1.copy()
@@ -70,7 +71,7 @@ XYZ100_to_sRGB1_matrix = np.array(
 sRGB1_to_XYZ100_matrix = np.linalg.inv(XYZ100_to_sRGB1_matrix)
 
 
-@numba.njit
+@numba.njit(cache=True)
 def XYZ100_to_sRGB1_linear(XYZ100):
     """Convert XYZ to linear sRGB, where XYZ is normalized so that reference
     white D65 is X=95.05, Y=100, Z=108.90 and sRGB is on the 0-1 scale. Linear
@@ -80,7 +81,7 @@ def XYZ100_to_sRGB1_linear(XYZ100):
     return np.dot(XYZ100_to_sRGB1_matrix, XYZ100) / 100.0
 
 
-@numba.njit
+@numba.njit(cache=True)
 def sRGB1_linear_to_XYZ100(sRGB1_linear):
     return np.dot(sRGB1_to_XYZ100_matrix, sRGB1_linear) * 100.0
 
@@ -146,7 +147,7 @@ RGBprime_aw = 400 * (tmp / (tmp + 27.13)) + 0.1
 A_w = (np.dot([2, 1, 1.0 / 20], RGBprime_aw) - 0.305) * N_bb
 
 # XYZ100 must have shape (3,) or (3, n)
-@numba.njit
+@numba.njit(cache=True)
 def XYZ100_to_CIECAM02(XYZ100):
     """Computes CIECAM02 appearance correlates for the given tristimulus
     value(s) XYZ (normalized to be on the 0-100 scale).
@@ -216,7 +217,7 @@ def XYZ100_to_CIECAM02(XYZ100):
     return np.array([J, M, h])
 
 
-@numba.njit
+@numba.njit(cache=True)
 def CIECAM02_to_XYZ100(J, M, h):
     """Return the unique tristimulus values that have the given CIECAM02
     appearance correlates under these viewing conditions.
@@ -306,25 +307,25 @@ def CIECAM02_to_XYZ100(J, M, h):
 #
 
 
-@numba.njit
+@numba.njit(cache=True)
 def CVD_forward_protanomaly(sRGB, severity):
     mat = machado_et_al_2009_matrix_protanomaly(severity)
     return np.dot(mat, sRGB)
 
 
-@numba.njit
+@numba.njit(cache=True)
 def CVD_forward_deuteranomaly(sRGB, severity):
     mat = machado_et_al_2009_matrix_deuteranomaly(severity)
     return np.dot(mat, sRGB)
 
 
-@numba.njit
+@numba.njit(cache=True)
 def CVD_forward_tritanomaly(sRGB, severity):
     mat = machado_et_al_2009_matrix_tritanomaly(severity)
     return np.dot(mat, sRGB)
 
 
-@numba.njit
+@numba.njit(cache=True)
 def jab_to_rgb_linear(jab):
     jmh = Jpapbp_to_JMh(jab)
     xyz100 = CIECAM02_to_XYZ100(J=jmh[0], M=jmh[1], h=jmh[2])
@@ -332,7 +333,7 @@ def jab_to_rgb_linear(jab):
     return srgb1_linear
 
 
-@numba.njit
+@numba.njit(cache=True)
 def rgb_linear_to_jab(srgb1_linear):
     xyz100 = sRGB1_linear_to_XYZ100(srgb1_linear)
     jmh = XYZ100_to_CIECAM02(xyz100)
@@ -351,7 +352,7 @@ def rgb_linear_to_jab(srgb1_linear):
 #   http://www.inf.ufrgs.br/~oliveira/pubs_files/CVD_Simulation/CVD_Simulation.html
 
 
-@numba.njit
+@numba.njit(cache=True)
 def machado_et_al_2009_matrix_protanomaly(severity):
     """Retrieve a matrix for simulating anomalous color vision.
 
@@ -448,7 +449,7 @@ def machado_et_al_2009_matrix_protanomaly(severity):
     return (1 - fraction / 10.0) * low_matrix + fraction / 10.0 * high_matrix
 
 
-@numba.njit
+@numba.njit(cache=True)
 def machado_et_al_2009_matrix_deuteranomaly(severity):
     """Retrieve a matrix for simulating anomalous color vision.
 
@@ -545,7 +546,7 @@ def machado_et_al_2009_matrix_deuteranomaly(severity):
     return (1 - fraction / 10.0) * low_matrix + fraction / 10.0 * high_matrix
 
 
-@numba.njit
+@numba.njit(cache=True)
 def machado_et_al_2009_matrix_tritanomaly(severity):
     """Retrieve a matrix for simulating anomalous color vision.
 
@@ -642,6 +643,53 @@ def machado_et_al_2009_matrix_tritanomaly(severity):
     return (1 - fraction / 10.0) * low_matrix + fraction / 10.0 * high_matrix
 
 
+# Matrices for every integer severity, precomputed so hot loops can simply index
+# them instead of interpolating, and so all severities can be applied to a color
+# with a single matrix multiplication. The pure-Python versions of the functions
+# are used to avoid compiling them on import.
+
+PROTANOMALY = 0
+DEUTERANOMALY = 1
+TRITANOMALY = 2
+
+MACHADO_ET_AL_MATRICES = np.array(
+    [
+        [f.py_func(severity) for severity in range(101)]
+        for f in (
+            machado_et_al_2009_matrix_protanomaly,
+            machado_et_al_2009_matrix_deuteranomaly,
+            machado_et_al_2009_matrix_tritanomaly,
+        )
+    ]
+)
+
+
+@numba.njit(cache=True)
+def CVD_forward(sRGB, cvd_type, severity):
+    """Simulate CVD for an integer severity using the precomputed matrices.
+
+    :param cvd_type: One of PROTANOMALY, DEUTERANOMALY, or TRITANOMALY.
+    :param severity: An integer between 0 and 100.
+    """
+    return np.dot(MACHADO_ET_AL_MATRICES[cvd_type, severity], sRGB)
+
+
+@numba.njit(cache=True)
+def CVD_forward_all_severities(sRGB, cvd_type):
+    """Simulate CVD at every integer severity from 0 to 100 at once.
+
+    :param sRGB: Linear sRGB color(s) with shape (3,) or (n, 3).
+    :param cvd_type: One of PROTANOMALY, DEUTERANOMALY, or TRITANOMALY.
+
+    :returns: Simulated colors with shape (101, 3) or (n, 101, 3). Results for
+        (n, 3) input may differ from single-color results in the last bit.
+    """
+    matrices = MACHADO_ET_AL_MATRICES[cvd_type].reshape((-1, 3))
+    if sRGB.ndim == 1:
+        return np.dot(matrices, sRGB).reshape((101, 3))
+    return np.dot(sRGB, matrices.T).reshape((sRGB.shape[0], 101, 3))
+
+
 #
 # CAM02-UCS (Luo, et al 2006)
 #
@@ -651,7 +699,7 @@ c1 = 0.007
 c2 = 0.0228
 
 
-@numba.njit
+@numba.njit(cache=True)
 def JMh_to_Jpapbp(JMh):
     J = JMh[..., 0]
     M = JMh[..., 1]
@@ -663,7 +711,7 @@ def JMh_to_Jpapbp(JMh):
     return np.array([Jp, ap, bp])
 
 
-@numba.njit
+@numba.njit(cache=True)
 def Jpapbp_to_JMh(Jpapbp):
     Jp = Jpapbp[..., 0]
     ap = Jpapbp[..., 1]
@@ -680,7 +728,7 @@ def Jpapbp_to_JMh(Jpapbp):
 #
 
 # Using color conventions: degrees 0-360
-@numba.njit
+@numba.njit(cache=True)
 def color_cart2polar(a, b):
     h_rad = np.arctan2(b, a)
     h = np.rad2deg(h_rad) % 360
@@ -688,13 +736,313 @@ def color_cart2polar(a, b):
     return (r, h)
 
 
-@numba.njit
+@numba.njit(cache=True)
 def color_polar2cart(r, h):
     h_rad = np.deg2rad(h)
     return (r * np.cos(h_rad), r * np.sin(h_rad))
 
 
-@numba.njit
+@numba.njit(cache=True)
 def cam02de(c1, c2):
     diff = np.abs(c1 - c2)
     return np.sqrt(np.sum(diff * diff, axis=-1))
+
+
+#
+# Batched conversions
+#
+
+# The functions above operate on a single color at a time. The following
+# functions instead operate on arrays of shape (n, 3), with the scalar branches
+# replaced by masked operations. Parallel versions, which apply the single-color
+# functions to each row across multiple threads and thus give identical results
+# to them, are also provided, both as Numba functions and, on request, as NumPy
+# gufuncs.
+
+
+@numba.njit(cache=True)
+def XYZ100_to_CIECAM02_batch(XYZ100):
+    """Batched version of `XYZ100_to_CIECAM02` for XYZ100 with shape (n, 3).
+    Returns J, M, h with shape (n, 3).
+    """
+
+    #### Steps 1-3
+
+    RGB = np.dot(XYZ100, np.ascontiguousarray(M_CAT02.T))
+    RGB_C = D_RGB * RGB
+    RGBprime = np.dot(RGB_C, np.ascontiguousarray(M_HPE_M_CAT02_inv.T))
+
+    #### Step 4
+
+    RGBprime_signs = np.sign(RGBprime)
+
+    tmp = (F_L * RGBprime_signs * RGBprime / 100) ** 0.42
+    RGBprime_a = RGBprime_signs * 400 * (tmp / (tmp + 27.13)) + 0.1
+
+    #### Step 5
+
+    a = np.dot(RGBprime_a, np.array([1, -12.0 / 11, 1.0 / 11]))
+    b = np.dot(RGBprime_a, np.array([1.0 / 9, 1.0 / 9, -2.0 / 9]))
+    h_rad = np.arctan2(b, a)
+    h = np.rad2deg(h_rad) % 360
+
+    #### Step 6 is skipped, since H isn't returned
+
+    #### Step 7
+
+    A = (np.dot(RGBprime_a, np.array([2, 1, 1.0 / 20])) - 0.305) * N_bb
+    A = np.where(A < 0, np.nan, A)
+
+    #### Step 8
+
+    J = 100 * (A / A_w) ** (c * z)
+
+    #### Step 10
+
+    e = (12500.0 / 13) * N_c * N_cb * (np.cos(h_rad + 2) + 3.8)
+    t = e * np.sqrt(a ** 2 + b ** 2) / np.dot(RGBprime_a, np.array([1, 1, 21.0 / 20]))
+
+    C = t ** 0.9 * (J / 100) ** 0.5 * (1.64 - 0.29 ** n) ** 0.73
+    M = C * F_L ** 0.25
+
+    JMh = np.empty((XYZ100.shape[0], 3))
+    JMh[:, 0] = J
+    JMh[:, 1] = M
+    JMh[:, 2] = h
+    return JMh
+
+
+@numba.njit(cache=True)
+def CIECAM02_to_XYZ100_batch(JMh):
+    """Batched version of `CIECAM02_to_XYZ100` for J, M, h with shape (n, 3).
+    Returns XYZ100 with shape (n, 3).
+    """
+    J = JMh[:, 0]
+    M = JMh[:, 1]
+    h = JMh[:, 2]
+
+    #### Steps 1-2
+
+    C = M / F_L ** 0.25
+
+    t = (C / (np.sqrt(J / 100) * (1.64 - 0.29 ** n) ** 0.73)) ** (1 / 0.9)
+    e_t = 0.25 * (np.cos(np.deg2rad(h) + 2) + 3.8)
+    A = A_w * (J / 100) ** (1 / (c * z))
+
+    one_over_t = np.where(t < 1e-30, np.inf, 1 / np.maximum(t, 1e-30))
+
+    p_1 = (50000.0 / 13) * N_c * N_cb * e_t * one_over_t
+    p_2 = A / N_bb + 0.305
+    p_3 = 21.0 / 20
+
+    #### Step 3
+
+    sin_h = np.sin(np.deg2rad(h))
+    cos_h = np.cos(np.deg2rad(h))
+
+    num = p_2 * (2 + p_3) * (460.0 / 1403)
+    denom_part2 = (2 + p_3) * (220.0 / 1403)
+    denom_part3 = (-27.0 / 1403) + p_3 * (6300.0 / 1403)
+
+    # Both branches are calculated for all colors, with the divisor of the
+    # branch that isn't used replaced to avoid dividing by zero
+    use_sin = np.abs(sin_h) >= np.abs(cos_h)
+    safe_sin_h = np.where(use_sin, sin_h, 1.0)
+    safe_cos_h = np.where(use_sin, 1.0, cos_h)
+
+    b_sin = num / (p_1 / safe_sin_h + denom_part2 * (cos_h / safe_sin_h) + denom_part3)
+    a_sin = b_sin * cos_h / safe_sin_h
+    a_cos = num / (p_1 / safe_cos_h + denom_part2 + denom_part3 * (sin_h / safe_cos_h))
+    b_cos = a_cos * sin_h / safe_cos_h
+    a = np.where(use_sin, a_sin, a_cos)
+    b = np.where(use_sin, b_sin, b_cos)
+
+    #### Step 4
+
+    p2ab = np.empty((JMh.shape[0], 3))
+    p2ab[:, 0] = p_2
+    p2ab[:, 1] = a
+    p2ab[:, 2] = b
+    RGBprime_a_matrix = (
+        1.0
+        / 1403
+        * np.array(
+            ([460.0, 451.0, 288.0], [460.0, -891.0, -261.0], [460.0, -220.0, -6300.0])
+        )
+    )
+
+    RGBprime_a = np.dot(p2ab, np.ascontiguousarray(RGBprime_a_matrix.T))
+
+    #### Step 5
+
+    RGBprime = (
+        np.sign(RGBprime_a - 0.1)
+        * (100 / F_L)
+        * ((27.13 * np.abs(RGBprime_a - 0.1)) / (400 - np.abs(RGBprime_a - 0.1)))
+        ** (1 / 0.42)
+    )
+
+    #### Steps 6-8
+
+    RGB_C = np.dot(RGBprime, np.ascontiguousarray(M_CAT02_M_HPE_inv.T))
+    RGB = RGB_C / D_RGB
+    return np.dot(RGB, np.ascontiguousarray(M_CAT02_inv.T))
+
+
+@numba.njit(cache=True)
+def JMh_to_Jpapbp_batch(JMh):
+    """Batched version of `JMh_to_Jpapbp` for JMh with shape (n, 3)."""
+    Jpapbp = np.empty_like(JMh)
+    J = JMh[:, 0]
+    M = JMh[:, 1]
+    h_rad = np.deg2rad(JMh[:, 2])
+    Jpapbp[:, 0] = (1 + 100 * c1) * J / (1 + c1 * J) / KL
+    Mp = (1.0 / c2) * np.log(1 + c2 * M)
+    Jpapbp[:, 1] = Mp * np.cos(h_rad)
+    Jpapbp[:, 2] = Mp * np.sin(h_rad)
+    return Jpapbp
+
+
+@numba.njit(cache=True)
+def Jpapbp_to_JMh_batch(Jpapbp):
+    """Batched version of `Jpapbp_to_JMh` for Jpapbp with shape (n, 3)."""
+    JMh = np.empty_like(Jpapbp)
+    Jp = Jpapbp[:, 0] * KL
+    ap = Jpapbp[:, 1]
+    bp = Jpapbp[:, 2]
+    JMh[:, 0] = -Jp / (c1 * Jp - 100 * c1 - 1)
+    JMh[:, 1] = (np.exp(c2 * np.hypot(ap, bp)) - 1) / c2
+    JMh[:, 2] = np.rad2deg(np.arctan2(bp, ap)) % 360
+    return JMh
+
+
+@numba.njit(cache=True)
+def rgb_linear_to_jab_batch(srgb1_linear):
+    """Batched version of `rgb_linear_to_jab` for colors with shape (n, 3)."""
+    xyz100 = np.dot(srgb1_linear, np.ascontiguousarray(sRGB1_to_XYZ100_matrix.T))
+    jmh = XYZ100_to_CIECAM02_batch(xyz100 * 100.0)
+    return JMh_to_Jpapbp_batch(jmh)
+
+
+@numba.njit(cache=True)
+def jab_to_rgb_linear_batch(jab):
+    """Batched version of `jab_to_rgb_linear` for colors with shape (n, 3)."""
+    xyz100 = CIECAM02_to_XYZ100_batch(Jpapbp_to_JMh_batch(jab))
+    return np.dot(xyz100, np.ascontiguousarray(XYZ100_to_sRGB1_matrix.T)) / 100.0
+
+
+@numba.njit(parallel=True, cache=True)
+def rgb_linear_to_jab_parallel(srgb1_linear):
+    """Multi-threaded `rgb_linear_to_jab` for colors with shape (n, 3)."""
+    jab = np.empty(srgb1_linear.shape)
+    for i in numba.prange(srgb1_linear.shape[0]):
+        jab[i] = rgb_linear_to_jab(np.ascontiguousarray(srgb1_linear[i]))
+    return jab
+
+
+@numba.njit(parallel=True, cache=True)
+def jab_to_rgb_linear_parallel(jab):
+    """Multi-threaded `jab_to_rgb_linear` for colors with shape (n, 3)."""
+    srgb1_linear = np.empty(jab.shape)
+    for i in numba.prange(jab.shape[0]):
+        srgb1_linear[i] = jab_to_rgb_linear(np.ascontiguousarray(jab[i]))
+    return srgb1_linear
+
+
+# The gufuncs are only built when first requested, since building them compiles
+# them (or loads them from the cache) and starts Numba's parallel threading
+# layer, which would otherwise slow down every import of this module and start
+# threads in every process that imports it.
+
+GUFUNC_TYPES = ["void(float64[:], float64[:])"]
+
+
+def rgb_linear_to_jab_kernel(srgb1_linear, jab):
+    jab[:] = rgb_linear_to_jab(np.ascontiguousarray(srgb1_linear))
+
+
+def jab_to_rgb_linear_kernel(jab, srgb1_linear):
+    srgb1_linear[:] = jab_to_rgb_linear(np.ascontiguousarray(jab))
+
+
+@functools.lru_cache(maxsize=None)
+def rgb_linear_to_jab_gufunc():
+    """Returns NumPy gufunc version of `rgb_linear_to_jab`, built on first use."""
+    return numba.guvectorize(
+        GUFUNC_TYPES, "(n)->(n)", target="parallel", cache=True
+    )(rgb_linear_to_jab_kernel)
+
+
+@functools.lru_cache(maxsize=None)
+def jab_to_rgb_linear_gufunc():
+    """Returns NumPy gufunc version of `jab_to_rgb_linear`, built on first use."""
+    return numba.guvectorize(
+        GUFUNC_TYPES, "(n)->(n)", target="parallel", cache=True
+    )(jab_to_rgb_linear_kernel)
+
+
+#
+# Color set distances
+#
+
+
+def min_set_distances(sRGB1, severities):
+    """Find the minimum perceptual distance between the colors of each color set,
+    for normal color vision and for each CVD type, in parallel across sets.
+
+    :param sRGB1: Color sets with shape (num_sets, num_colors, 3), as floats in
+        the 0-to-1 range or as `uint8` sRGB255 values, e.g., as returned by
+        `set_generation.load_color_sets`, which are divided by 255. Other
+        integer types are rejected.
+    :param severities: Integer CVD severities (1 to 100) to check.
+
+    :returns: Minimum CAM02-UCS distances with shape (num_sets, 4), for normal
+        color vision followed by PROTANOMALY, DEUTERANOMALY, and TRITANOMALY,
+        each minimized over the given severities. Since the colors are converted
+        with the batched functions, results may differ in the last bits.
+    """
+    sRGB1 = np.asarray(sRGB1)
+    if sRGB1.dtype == np.uint8:
+        sRGB1 = sRGB1 / 255
+    elif not np.issubdtype(sRGB1.dtype, np.floating):
+        raise TypeError(
+            f"Colors must be floats in the 0-to-1 range or uint8, not {sRGB1.dtype}"
+        )
+    return calc_min_set_distances(
+        np.ascontiguousarray(sRGB1, dtype=np.float64),
+        np.asarray(severities, dtype=np.int64),
+    )
+
+
+@numba.njit(parallel=True, cache=True)
+def calc_min_set_distances(sRGB1, severities):
+    """Kernel for `min_set_distances`, for float64 colors in the 0-to-1 range."""
+    num_sets = sRGB1.shape[0]
+    num_colors = sRGB1.shape[1]
+    num_severities = severities.shape[0]
+    min_dists = np.full((num_sets, 4), np.inf)
+    for s in numba.prange(num_sets):
+        rgb_linear = np.empty((num_colors, 3))
+        for i in range(num_colors):
+            rgb_linear[i] = sRGB1_to_sRGB1_linear(sRGB1[s, i])
+        jab = rgb_linear_to_jab_batch(rgb_linear)
+        for i in range(num_colors):
+            for j in range(i):
+                min_dists[s, 0] = min(min_dists[s, 0], cam02de(jab[i], jab[j]))
+        # Convert the simulated colors for all severities at once
+        cvd_rgb_linear = np.empty((num_severities, num_colors, 3))
+        for cvd_type in range(3):
+            for k in range(num_severities):
+                for i in range(num_colors):
+                    cvd_rgb_linear[k, i] = CVD_forward(
+                        rgb_linear[i], cvd_type, severities[k]
+                    )
+            jab = rgb_linear_to_jab_batch(cvd_rgb_linear.reshape((-1, 3)))
+            jab = jab.reshape((num_severities, num_colors, 3))
+            for k in range(num_severities):
+                for i in range(num_colors):
+                    for j in range(i):
+                        min_dists[s, cvd_type + 1] = min(
+                            min_dists[s, cvd_type + 1], cam02de(jab[k, i], jab[k, j])
+                        )
+    return min_dists
@@ -0,0 +1,64 @@
+"""
+On-disk cache for the precomputed CAM02-UCS color tables.
+
+Calculating CAM02-UCS coordinates for all 16.8 million 8-bit RGB colors, for
+normal color vision and for three types of color vision deficiency, takes
+minutes, so the resulting tables are written to disk the first time they are
+calculated. Later runs open the cached tables with `np.memmap`, which makes
+startup nearly instant and lets concurrent runs share pages through the OS
+page cache.
+
+Copyright (c) 2021 Matthew Petroff
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import os
+import numpy as np
+
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "table-cache")
+
+TABLE_NAMES = ("rgb", "jab", "deut_jab", "prot_jab", "trit_jab")
+
+
+def cache_key(prefix, min_j, max_j, cvd_severity):
+    """
+    Constructs cache key for tables calculated with the given parameters.
+    """
+    return f"{prefix}_cvd{cvd_severity}_minj{min_j}_maxj{max_j}"
+
+
+def load_tables(key, calc_tables, cache_dir=CACHE_DIR, names=TABLE_NAMES):
+    """
+    Loads color tables from the cache as read-only memory maps. If they are not
+    already cached, `calc_tables()` is called to calculate them, and its
+    results, which must be in the same order as `names`, are cached first.
+    """
+    paths = [os.path.join(cache_dir, f"{key}_{name}.npy") for name in names]
+    if not all(os.path.exists(path) for path in paths):
+        os.makedirs(cache_dir, exist_ok=True)
+        tables = calc_tables()
+        for path, table in zip(paths, tables):
+            # Write to a temporary file and then rename it, so an interrupted
+            # run or a concurrent reader never sees a partially written table
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as outfile:
+                np.save(outfile, np.ascontiguousarray(table))
+            os.replace(tmp_path, path)
+    return tuple(np.load(path, mmap_mode="r") for path in paths)
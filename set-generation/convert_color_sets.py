@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+"""
+Converts color set files between the text format and the binary `.npz` format,
+in whichever direction matches the input file extension. The generation
+parameters stored in binary files are parsed from the first header line of text
+files.
+
+Copyright (c) 2021 Matthew Petroff
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import argparse
+import os
+import set_generation
+
+
+parser = argparse.ArgumentParser(
+    description="Convert color set files between text and binary (.npz) formats.",
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+)
+parser.add_argument(
+    "input", metavar="INPUT", nargs="+", help="Color set files (.txt or .npz)"
+)
+args = parser.parse_args()
+
+for filename in args.input:
+    root, ext = os.path.splitext(filename)
+    if ext == ".txt":
+        colors, header = set_generation.read_color_sets_txt(filename)
+        set_generation.save_color_sets(root + ".npz", colors, header)
+        print(f"{filename} -> {root}.npz ({colors.shape[0]} sets)")
+    elif ext == ".npz":
+        colors, metadata = set_generation.load_color_sets(filename)
+        set_generation.write_color_sets_txt(root + ".txt", colors, metadata["header"])
+        print(f"{filename} -> {root}.txt ({colors.shape[0]} sets)")
+    else:
+        parser.error(f"unknown file extension: {filename}")
@@ -0,0 +1,18 @@
+"""
+Library for generating accessible color sets and color cycles.
+
+The modules in the `set-generation` directory (`color_conversions`,
+`color_tables`, and `spatial_index`) must be importable, e.g., by running from
+that directory or by adding it to `sys.path`.
+"""
+
+from .generator import ColorSetGenerator, gen_color_names, sort_colors
+from .ordering import optimal_cycle_order
+from .sequential import SequentialCycleGenerator
+from .set_files import (
+    load_color_sets,
+    read_color_sets_txt,
+    save_color_sets,
+    write_color_sets_txt,
+)
+
@@ -0,0 +1,588 @@
+"""
+Generator for random color sets with a minimum-perceptual-distance requirement.
+
+All of the generation parameters are passed to the Numba kernels as runtime
+arguments, instead of being baked into them as module-level constants, so
+generators for many different configurations can be created in the same process
+without recompiling the kernels.
+
+Copyright (c) 2018-2021 Matthew Petroff
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import collections
+import numpy as np
+import numba
+import color_conversions
+import color_tables
+import spatial_index
+
+
+#
+# Generate list of colors
+#
+
+# Since CAM02-UCS conversions are computationally expensive, but the
+# 16.8 million possible 8-bit RGB colors easily fit in memory, we precompute
+# the list of colors for normal color vision and three types of color vision
+# deficiency. Additionally, very dark and very light colors are discarded. The
+# resulting tables are cached on disk, so they only need to be calculated once
+# for a given lightness range and CVD severity.
+
+
+@numba.njit(cache=True)
+def all_rgb_colors():
+    """
+    Returns all 8-bit RGB colors, with red varying fastest.
+    """
+    rgb_colors = np.empty((256 ** 3, 3), dtype=np.uint8)
+    for i in range(256 ** 3):
+        rgb_colors[i, 0] = i % 256
+        rgb_colors[i, 1] = (i // 256) % 256
+        rgb_colors[i, 2] = i // (256 ** 2)
+    return rgb_colors
+
+
+@numba.njit(parallel=True, cache=True)
+def calc_jab_colors(min_j, max_j, cvd_severity):
+    """
+    Calculates CAM02-UCS colors for all 8-bit RGB colors with $J' \in [J'_{min}, J'_{max}]$.
+    """
+    rgb_colors = all_rgb_colors()
+    rgb_linear = color_conversions.sRGB1_to_sRGB1_linear(
+        rgb_colors.flatten() / 255
+    ).reshape((-1, 3))
+    jab = color_conversions.rgb_linear_to_jab_parallel(rgb_linear)
+    idx = np.nonzero(np.logical_and(jab[:, 0] >= min_j, jab[:, 0] <= max_j))[0]
+    rgb_colors = rgb_colors[idx]
+    jab_colors = jab[idx].astype(np.float32)
+    deut_jab_colors = np.empty_like(jab_colors)
+    prot_jab_colors = np.empty_like(jab_colors)
+    trit_jab_colors = np.empty_like(jab_colors)
+    for c in numba.prange(idx.size):
+        rgb_linear_c = rgb_linear[idx[c]]
+        deut_jab_colors[c] = color_conversions.rgb_linear_to_jab(
+            color_conversions.CVD_forward(
+                rgb_linear_c, color_conversions.DEUTERANOMALY, cvd_severity
+            )
+        )
+        prot_jab_colors[c] = color_conversions.rgb_linear_to_jab(
+            color_conversions.CVD_forward(
+                rgb_linear_c, color_conversions.PROTANOMALY, cvd_severity
+            )
+        )
+        trit_jab_colors[c] = color_conversions.rgb_linear_to_jab(
+            color_conversions.CVD_forward(
+                rgb_linear_c, color_conversions.TRITANOMALY, cvd_severity
+            )
+        )
+    return rgb_colors, jab_colors, deut_jab_colors, prot_jab_colors, trit_jab_colors
+
+
+@numba.njit(parallel=True, cache=True)
+def calc_jab_volumes(rgb_colors):
+    """
+    Calculates the CAM02-UCS volume of the region that rounds to each 8-bit RGB
+    color, using the Jacobian determinant of the RGB to CAM02-UCS transform.
+    """
+    volumes = np.empty(rgb_colors.shape[0], dtype=np.float32)
+    for c in numba.prange(rgb_colors.shape[0]):
+        # Central differences over RGB cell
+        jacobian = np.empty((3, 3))
+        for d in range(3):
+            lower = rgb_colors[c].astype(np.float64)
+            upper = lower.copy()
+            lower[d] -= 0.5
+            upper[d] += 0.5
+            jacobian[:, d] = color_conversions.rgb_linear_to_jab(
+                color_conversions.sRGB1_to_sRGB1_linear(upper / 255)
+            ) - color_conversions.rgb_linear_to_jab(
+                color_conversions.sRGB1_to_sRGB1_linear(lower / 255)
+            )
+        volumes[c] = np.abs(
+            jacobian[0, 0]
+            * (jacobian[1, 1] * jacobian[2, 2] - jacobian[1, 2] * jacobian[2, 1])
+            - jacobian[0, 1]
+            * (jacobian[1, 0] * jacobian[2, 2] - jacobian[1, 2] * jacobian[2, 0])
+            + jacobian[0, 2]
+            * (jacobian[1, 0] * jacobian[2, 1] - jacobian[1, 1] * jacobian[2, 0])
+        )
+    return volumes
+
+
+#
+# Generate color set
+#
+
+# To generate a color set, a starting color is chosen at random in the
+# CAM02-UCS space via rejection sampling. Then, each possible color is checked
+# to see if it is far enough away in both lightness and perceptual distance,
+# both for normal color vision and for those with color vision deficiency. Of
+# these remaining colors, one is chosen at random by using rejection sampling
+# starting in the CAM02-UCS space. The process is then repeated until the color
+# set contains the desired number of colors. This method of first
+# precalculating all remaining valid colors has an advantage over plain
+# rejection sampling, since it is guaranteed to return. Checking a coarse CVD
+# interval during set generation was tried but removed, since the performance
+# penalty outweighs the gains from having to try again fewer times.
+# To avoid rescanning every remaining color each time a color is added to the
+# set, the colors are indexed with uniform grids in CAM02-UCS (one for normal
+# color vision and one for each CVD type) and sorted by lightness, so only the
+# colors near the newly-added color need to be checked. A dense lookup table
+# from packed RGB values to color indices is used to look up sampled colors.
+
+NO_COLOR = np.iinfo(np.uint32).max
+
+
+@numba.njit(cache=True)
+def pack_rgb(rgb):
+    """
+    Packs 8-bit RGB color into a 24-bit integer, with red in the lowest bits.
+    """
+    return int(rgb[0]) + 256 * int(rgb[1]) + 256 ** 2 * int(rgb[2])
+
+
+@numba.njit(cache=True)
+def build_rgb_index(rgb_colors):
+    """
+    Builds lookup table from packed RGB value to color index.
+    """
+    rgb_index = np.full(256 ** 3, NO_COLOR, dtype=np.uint32)
+    for i in range(rgb_colors.shape[0]):
+        rgb_index[pack_rgb(rgb_colors[i])] = i
+    return rgb_index
+
+
+# Numba freezes global arrays into the compiled code as constants, which copies
+# them into every process that compiles the kernels. Instead, the tables are
+# passed to the kernels as arguments. The color tables are memory maps of the
+# cache files, and the indices can be built before any worker processes are
+# forked, so all processes share the same pages. Forking is only safe if the
+# process has not started a threading layer that is not fork-safe, such as TBB
+# or GNU OpenMP, e.g., by running the parallel kernels that calculate the color
+# tables, so `gen_color_sets.py` uses the workqueue threading layer.
+
+ColorTables = collections.namedtuple(
+    "ColorTables",
+    [
+        "rgb_colors",
+        "jab_colors",
+        "deut_jab_colors",
+        "prot_jab_colors",
+        "trit_jab_colors",
+        "jab_volumes",
+        "rgb_index",
+        "light_index",
+        "jab_grid",
+        "deut_jab_grid",
+        "prot_jab_grid",
+        "trit_jab_grid",
+    ],
+)
+
+# The generation parameters are converted to fixed types before being passed to
+# the kernels, so the kernels are only compiled once for all configurations.
+
+SetParams = collections.namedtuple(
+    "SetParams",
+    [
+        "num_colors",
+        "min_color_dist",
+        "min_light_dist",
+        "min_j",
+        "max_j",
+        "min_a",
+        "max_a",
+        "min_b",
+        "max_b",
+        "include_bug",
+        "exact_sampling",
+    ],
+)
+
+
+@numba.njit(cache=True)
+def valid_bounds(valid, jab_colors):
+    """
+    Finds bounding box of valid colors in CAM02-UCS.
+    """
+    lower = np.full(3, np.inf, dtype=np.float32)
+    upper = np.full(3, -np.inf, dtype=np.float32)
+    for i in range(valid.size):
+        if valid[i]:
+            for d in range(3):
+                lower[d] = min(lower[d], jab_colors[i, d])
+                upper[d] = max(upper[d], jab_colors[i, d])
+    return lower, upper
+
+
+@numba.njit(cache=True)
+def sample_valid(valid, jab_volumes):
+    """
+    Picks a random valid color, with colors weighted by their CAM02-UCS volume.
+    """
+    total = 0.0
+    for i in range(valid.size):
+        if valid[i]:
+            total += jab_volumes[i]
+    remaining = total * np.random.random_sample()
+    pick = -1
+    for i in range(valid.size):
+        if valid[i]:
+            pick = i
+            remaining -= jab_volumes[i]
+            if remaining < 0:
+                break
+    return pick
+
+
+@numba.njit(cache=True)
+def sample_rejection(
+    valid, rgb_index, include_bug, min_j, max_j, min_a, max_a, min_b, max_b
+):
+    """
+    Picks a random valid color using rejection sampling in the given CAM02-UCS
+    bounding box.
+    """
+    while True:
+        jab = np.array(
+            (
+                (max_j - min_j) * np.random.random_sample() + min_j,
+                (max_a - min_a) * np.random.random_sample() + min_a,
+                (max_b - min_b) * np.random.random_sample() + min_b,
+            )
+        )
+        cp = (
+            color_conversions.sRGB1_linear_to_sRGB1(
+                color_conversions.jab_to_rgb_linear(jab)
+            )
+            * 255
+        )
+        if not include_bug:
+            # Need to use optional arguments for np.round
+            # See https://github.com/numba/numba/issues/4439
+            cp2 = np.empty_like(cp)
+            cp = np.round(cp, 0, cp2)
+            cp = cp2
+            if np.min(cp) < 0 or np.max(cp) > 255:
+                continue
+        cp = cp.astype(np.uint8)
+        idx = rgb_index[pack_rgb(cp)]
+        if idx != NO_COLOR and valid[idx]:
+            return idx
+
+
+@numba.njit(cache=True)
+def gen_color_set(seed, tables, params):
+    """
+    Generates color set using specified PRNG seed, color tables, and parameters.
+    """
+    np.random.seed(seed)
+    num_colors = params.num_colors
+    jab_colors = np.empty((num_colors, 3), dtype=np.float32)
+    deut_jab_colors = jab_colors.copy()
+    prot_jab_colors = jab_colors.copy()
+    trit_jab_colors = jab_colors.copy()
+    rgb_colors = np.empty((num_colors, 3), dtype=np.uint8)
+
+    valid = np.ones(tables.rgb_colors.shape[0], dtype=np.bool_)
+    num_valid = valid.size
+
+    # Pick first color
+    if params.exact_sampling:
+        first_color_idx = sample_valid(valid, tables.jab_volumes)
+    else:
+        first_color_idx = sample_rejection(
+            valid,
+            tables.rgb_index,
+            params.include_bug,
+            params.min_j,
+            params.max_j,
+            params.min_a,
+            params.max_a,
+            params.min_b,
+            params.max_b,
+        )
+
+    rgb_colors[0] = tables.rgb_colors[first_color_idx]
+    jab_colors[0] = tables.jab_colors[first_color_idx]
+    deut_jab_colors[0] = tables.deut_jab_colors[first_color_idx]
+    prot_jab_colors[0] = tables.prot_jab_colors[first_color_idx]
+    trit_jab_colors[0] = tables.trit_jab_colors[first_color_idx]
+    for i in range(1, num_colors):
+        # Find remaining valid colors
+        num_valid -= spatial_index.remove_within_sorted(
+            tables.light_index, jab_colors[i - 1][0], params.min_light_dist, valid
+        )
+        num_valid -= spatial_index.remove_within_grid(
+            tables.jab_grid,
+            tables.jab_colors,
+            jab_colors[i - 1],
+            params.min_color_dist,
+            valid,
+        )
+        num_valid -= spatial_index.remove_within_grid(
+            tables.deut_jab_grid,
+            tables.deut_jab_colors,
+            deut_jab_colors[i - 1],
+            params.min_color_dist,
+            valid,
+        )
+        num_valid -= spatial_index.remove_within_grid(
+            tables.prot_jab_grid,
+            tables.prot_jab_colors,
+            prot_jab_colors[i - 1],
+            params.min_color_dist,
+            valid,
+        )
+        num_valid -= spatial_index.remove_within_grid(
+            tables.trit_jab_grid,
+            tables.trit_jab_colors,
+            trit_jab_colors[i - 1],
+            params.min_color_dist,
+            valid,
+        )
+        if num_valid == 0:
+            return None
+
+        # Pick next color
+        if params.exact_sampling:
+            pick = sample_valid(valid, tables.jab_volumes)
+        elif params.include_bug:
+            # Old, slower behavior
+            pick = sample_rejection(
+                valid,
+                tables.rgb_index,
+                params.include_bug,
+                params.min_j,
+                params.max_j,
+                params.min_a,
+                params.max_a,
+                params.min_b,
+                params.max_b,
+            )
+        else:
+            # Revised, faster behavior
+            lower, upper = valid_bounds(valid, tables.jab_colors)
+            pick = sample_rejection(
+                valid,
+                tables.rgb_index,
+                params.include_bug,
+                lower[0],
+                upper[0],
+                lower[1],
+                upper[1],
+                lower[2],
+                upper[2],
+            )
+
+        rgb_colors[i] = tables.rgb_colors[pick]
+        jab_colors[i] = tables.jab_colors[pick]
+        deut_jab_colors[i] = tables.deut_jab_colors[pick]
+        prot_jab_colors[i] = tables.prot_jab_colors[pick]
+        trit_jab_colors[i] = tables.trit_jab_colors[pick]
+
+    return rgb_colors
+
+
+# The finer CVD check is only needed for severities below the one used for set
+# generation. Since most failures occur near the highest severity, severities
+# are checked from highest to lowest, first on a coarse grid and then on
+# successively finer grids, so a failing set is usually rejected after checking
+# only a few severities.
+
+
+def severity_schedule(max_severity, coarse_step=16):
+    """
+    Orders severities below `max_severity` coarse-to-fine, highest first.
+    """
+    schedule = []
+    step = coarse_step
+    while step >= 1:
+        for severity in range(max_severity - 1, 0, -step):
+            if severity not in schedule:
+                schedule.append(severity)
+        step //= 2
+    return np.array(schedule, dtype=np.int64)
+
+
+@numba.njit(cache=True)
+def check_color_set(rgb_colors, severities, min_color_dist):
+    """
+    Check at finer CVD simulation interval.
+    Returns True if colors set is okay, else False
+    """
+    num_colors = rgb_colors.shape[0]
+    rgb_linear = np.empty((num_colors, 3))
+    for i in range(num_colors):
+        rgb_linear[i] = color_conversions.sRGB1_to_sRGB1_linear(rgb_colors[i] / 255)
+    cvd_jab_test = np.empty((3, num_colors, 3), dtype=np.float32)
+    for severity in severities:
+        for cvd_type in range(3):
+            for i in range(num_colors):
+                cvd_jab_test[cvd_type, i] = color_conversions.rgb_linear_to_jab(
+                    color_conversions.CVD_forward(rgb_linear[i], cvd_type, severity)
+                )
+        for i in range(num_colors):
+            for j in range(i + 1, num_colors):
+                for cvd_type in range(3):
+                    if (
+                        color_conversions.cam02de(
+                            cvd_jab_test[cvd_type, i], cvd_jab_test[cvd_type, j]
+                        )
+                        < min_color_dist
+                    ):
+                        return False
+    return True
+
+
+def sort_colors(colors):
+    """
+    Sorts colors.
+    """
+    return colors[np.lexsort(colors[:, ::-1].T)]
+
+
+def gen_color_names(colors):
+    """
+    Convert RGB values into a hexadecimal color string.
+    """
+    color_names = []
+    for color in colors:
+        name = "{:02x}{:02x}{:02x}".format(*color)
+        color_names.append(name)
+    return color_names
+
+
+class ColorSetGenerator(object):
+    """
+    Generates random color sets with a minimum perceptual distance between all
+    colors, both for normal color vision and for color vision deficiency, and a
+    minimum lightness distance between all colors.
+
+    Originally, sRGB values were cast to unsigned 8-bit integers without first
+    checking if they were in the sRGB gamut. This meant that colors were not
+    uniformly drawn from the CAM02-UCS gamut, since sRGB out-of-gamut colors
+    were wrapped to be in-gamut, a transform that happened in sRGB space. The
+    original (incorrect) behavior is kept as the `include_bug` option so the
+    color sets used for the survey can be reproduced. If it is not set,
+    additional optimizations are also enabled.
+
+    Instead of using rejection sampling in the bounding box of the remaining
+    valid colors, the next color can also be sampled directly from the valid
+    colors, with each color weighted by the CAM02-UCS volume that rounds to it,
+    by setting `exact_sampling`. This gives the same distribution, but the
+    number of iterations needed per color is bounded, which helps when the valid
+    colors are sparse and fragmented.
+    """
+
+    def __init__(
+        self,
+        min_color_dist=20,
+        min_light_dist=4,
+        num_colors=8,
+        cvd_severity=100,
+        min_j=40,
+        max_j=90,
+        include_bug=False,
+        exact_sampling=False,
+        cache_dir=color_tables.CACHE_DIR,
+    ):
+        if exact_sampling and include_bug:
+            raise ValueError("exact_sampling cannot be combined with include_bug")
+        self.min_color_dist = float(min_color_dist)
+        self.min_light_dist = float(min_light_dist)
+        self.num_colors = int(num_colors)
+        self.cvd_severity = int(cvd_severity)
+        self.min_j = int(min_j)
+        self.max_j = int(max_j)
+        self.include_bug = bool(include_bug)
+        self.exact_sampling = bool(exact_sampling)
+
+        (
+            rgb_colors,
+            jab_colors,
+            deut_jab_colors,
+            prot_jab_colors,
+            trit_jab_colors,
+        ) = color_tables.load_tables(
+            color_tables.cache_key("sets", self.min_j, self.max_j, self.cvd_severity),
+            lambda: calc_jab_colors(self.min_j, self.max_j, self.cvd_severity),
+            cache_dir,
+        )
+        if self.exact_sampling:
+            (jab_volumes,) = color_tables.load_tables(
+                f"volumes_minj{self.min_j}_maxj{self.max_j}",
+                lambda: (calc_jab_volumes(rgb_colors),),
+                cache_dir,
+                names=("volume",),
+            )
+        else:
+            jab_volumes = np.empty(0, dtype=np.float32)
+
+        self.tables = ColorTables(
+            rgb_colors,
+            jab_colors,
+            deut_jab_colors,
+            prot_jab_colors,
+            trit_jab_colors,
+            jab_volumes,
+            build_rgb_index(rgb_colors),
+            spatial_index.build_sorted_index(np.ascontiguousarray(jab_colors[:, 0])),
+            spatial_index.build_grid(jab_colors, self.min_color_dist),
+            spatial_index.build_grid(deut_jab_colors, self.min_color_dist),
+            spatial_index.build_grid(prot_jab_colors, self.min_color_dist),
+            spatial_index.build_grid(trit_jab_colors, self.min_color_dist),
+        )
+        self.params = SetParams(
+            self.num_colors,
+            self.min_color_dist,
+            self.min_light_dist,
+            float(self.min_j),
+            float(self.max_j),
+            float(np.min(jab_colors[:, 1]) - 0.1),
+            float(np.max(jab_colors[:, 1]) + 0.1),
+            float(np.min(jab_colors[:, 2]) - 0.1),
+            float(np.max(jab_colors[:, 2]) + 0.1),
+            self.include_bug,
+            self.exact_sampling,
+        )
+        self.severities = severity_schedule(self.cvd_severity)
+
+    def gen_sorted_color_set(self, seed, info=""):
+        """
+        Generates a sorted color set using specified PRNG seed.
+        """
+        i = 0
+        while True:
+            # Keep trying until set generation succeeds
+            colors = gen_color_set(seed + i, self.tables, self.params)
+            if colors is not None and check_color_set(
+                colors, self.severities, self.min_color_dist
+            ):
+                print(f"Set generation iteration {i} for seed {seed} {info} succeeded!")
+                break
+            if colors is not None:
+                print(
+                    f"CVD check for set generation iteration {i} for seed {seed} {info} failed!"
+                )
+            else:
+                print(f"Set generation iteration {i} for seed {seed} {info} failed!")
+            i += 1
+        return sort_colors(colors)
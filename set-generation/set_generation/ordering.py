@@ -0,0 +1,196 @@
+"""
+Optimal ordering of color sets into color cycles.
+
+Orderings are ranked with the accessibility score used in
+`aesthetic-models/cycle-evaluation.ipynb`: for each prefix of the cycle, the
+minimum perceptual distance (for normal color vision and for each CVD type)
+between the colors in the prefix and the background color is multiplied by
+their minimum lightness (J') difference, and these products are averaged over
+all prefixes. Optionally, orderings in which a color name repeats early in the
+cycle are excluded.
+
+Since each term only depends on which colors are in the prefix, not on their
+order, the best ordering is found with dynamic programming over subsets of
+colors, which visits 2^n prefix sets instead of n! orderings, so color sets with
+a dozen or more colors are tractable.
+
+Copyright (c) 2021 Matthew Petroff
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+import numba
+import color_conversions
+
+
+#
+# Distance tables
+#
+
+
+@numba.njit(cache=True)
+def calc_distance_tables(rgb_colors, cvd_severity):
+    """
+    Calculates the minimum perceptual distance, for normal color vision and for
+    each CVD type, and the lightness (J') difference between each pair of the
+    given colors; shape=(num_colors, num_colors).
+    """
+    num_colors = rgb_colors.shape[0]
+    jab = np.empty((4, num_colors, 3))
+    for i in range(num_colors):
+        rgb_linear = color_conversions.sRGB1_to_sRGB1_linear(rgb_colors[i] / 255)
+        jab[0, i] = color_conversions.rgb_linear_to_jab(rgb_linear)
+        for cvd_type in range(3):
+            jab[cvd_type + 1, i] = color_conversions.rgb_linear_to_jab(
+                color_conversions.CVD_forward(rgb_linear, cvd_type, cvd_severity)
+            )
+    dist = np.empty((num_colors, num_colors))
+    light_dist = np.empty((num_colors, num_colors))
+    for i in range(num_colors):
+        for j in range(num_colors):
+            dist[i, j] = np.inf
+            for view in range(4):
+                dist[i, j] = min(
+                    dist[i, j], color_conversions.cam02de(jab[view, i], jab[view, j])
+                )
+            light_dist[i, j] = abs(jab[0, i, 0] - jab[0, j, 0])
+    return dist, light_dist
+
+
+#
+# Dynamic programming over prefix sets
+#
+
+
+@numba.njit(cache=True)
+def calc_prefix_values(dist, light_dist, names, unique_name_count):
+    """
+    Calculates the score term of each prefix set, encoded as a bit mask of the
+    colors it contains, and whether the prefix set is allowed. Index 0 of the
+    tables and names is the background color, which is in every prefix.
+    """
+    num_colors = dist.shape[0] - 1
+    num_masks = 1 << num_colors
+    values = np.zeros(num_masks)
+    allowed = np.ones(num_masks, dtype=np.bool_)
+    min_dist = np.full(num_masks, np.inf)
+    min_light_dist = np.full(num_masks, np.inf)
+    duplicate_name = np.zeros(num_masks, dtype=np.bool_)
+    for mask in range(1, num_masks):
+        # Add lowest color in set to set of remaining colors
+        color = 0
+        while not (mask >> color) & 1:
+            color += 1
+        rest = mask & (mask - 1)
+        d = min_dist[rest]
+        light = min_light_dist[rest]
+        duplicate = duplicate_name[rest]
+        for k in range(num_colors + 1):
+            if k == 0 or (rest >> (k - 1)) & 1:
+                d = min(d, dist[color + 1, k])
+                light = min(light, light_dist[color + 1, k])
+                duplicate |= names[color + 1] == names[k]
+        min_dist[mask] = d
+        min_light_dist[mask] = light
+        duplicate_name[mask] = duplicate
+        values[mask] = d * light
+
+        # Color names must not repeat in prefixes that are shorter than both the
+        # full cycle and the number of unique color names
+        count = 0
+        for c in range(num_colors):
+            count += (mask >> c) & 1
+        if duplicate and count < num_colors and count <= unique_name_count:
+            allowed[mask] = False
+    return values, allowed
+
+
+@numba.njit(cache=True)
+def order_cycle(dist, light_dist, names, unique_name_count, first):
+    """
+    Finds the ordering with the highest score, optionally with a fixed first
+    color (-1 for none). Ties are broken in favor of the lexicographically
+    smallest ordering. Returns the ordering and its score, or an empty ordering
+    and a score of zero if no ordering is allowed.
+    """
+    num_colors = dist.shape[0] - 1
+    num_masks = 1 << num_colors
+    values, allowed = calc_prefix_values(dist, light_dist, names, unique_name_count)
+
+    # Best sum of score terms for the remaining prefixes, given the colors that
+    # are already in the cycle, and the next color that achieves it
+    best = np.full(num_masks, -np.inf)
+    next_color = np.full(num_masks, -1)
+    best[num_masks - 1] = 0
+    for mask in range(num_masks - 2, -1, -1):
+        for color in range(num_colors):
+            if mask == 0 and first >= 0 and color != first:
+                continue
+            new_mask = mask | (1 << color)
+            if new_mask != mask and allowed[new_mask]:
+                total = values[new_mask] + best[new_mask]
+                if total > best[mask]:
+                    best[mask] = total
+                    next_color[mask] = color
+
+    if best[0] == -np.inf:
+        return np.empty(0, dtype=np.int64), 0.0
+    order = np.empty(num_colors, dtype=np.int64)
+    mask = 0
+    for i in range(num_colors):
+        order[i] = next_color[mask]
+        mask |= 1 << order[i]
+    return order, best[0] / num_colors
+
+
+def optimal_cycle_order(
+    rgb_colors,
+    names=None,
+    background_name=None,
+    first=None,
+    background=(255, 255, 255),
+    cvd_severity=100,
+):
+    """
+    Finds the ordering of a color set that maximizes the accessibility score,
+    using dynamic programming over prefix sets. `rgb_colors` are sRGB255 colors
+    with shape (num_colors, 3). If integer color `names` are given, orderings in
+    which a name repeats, including `background_name`, within the first `k`
+    colors are excluded, for `k` less than the number of colors and at most the
+    number of unique names. If `first` is given, only orderings starting with
+    that color are considered. Returns the ordering, as indices into
+    `rgb_colors`, and its score, or `None` and a score of zero if no ordering is
+    allowed.
+    """
+    rgb_colors = np.asarray(rgb_colors, dtype=np.int64)
+    num_colors = rgb_colors.shape[0]
+    colors = np.concatenate((np.array([background], dtype=np.int64), rgb_colors))
+    dist, light_dist = calc_distance_tables(colors, cvd_severity)
+    if names is None:
+        names = np.arange(num_colors + 1)
+    else:
+        background_name = -1 if background_name is None else background_name
+        names = np.concatenate(([background_name], names)).astype(np.int64)
+    unique_name_count = len(set(names[1:]))
+    order, score = order_cycle(
+        dist, light_dist, names, unique_name_count, -1 if first is None else first
+    )
+    if order.size == 0:
+        return None, score
+    return order, score
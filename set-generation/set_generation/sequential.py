@@ -0,0 +1,411 @@
+"""
+Generator for maximally-distinct color cycles using sequential search.
+
+As for the color-set generator, the parameters are passed to the Numba kernels
+as runtime arguments, so cycles for different configurations can be generated
+in the same process without recompiling the kernels.
+
+Copyright (c) 2018-2021 Matthew Petroff
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+import numba
+import color_conversions
+import color_tables
+from .generator import all_rgb_colors
+
+
+#
+# Generate list of colors
+#
+
+# Since CAM02-UCS conversions are computationally expensive, but the
+# 16.8 million possible 8-bit RGB colors easily fit in memory, we precompute
+# the list of colors for normal color vision and three types of color vision
+# deficiency. Since the CVD tables contain every severity, they are very large,
+# so they are cached on disk and memory mapped instead of being recalculated
+# and held in memory. To reduce their size further, the CVD tables can instead
+# only contain a coarse grid of severities, in which case the CVD colors for all
+# severities are recalculated when needed for the few candidate colors that
+# could be chosen next.
+
+CVD_TYPES = (
+    color_conversions.DEUTERANOMALY,
+    color_conversions.PROTANOMALY,
+    color_conversions.TRITANOMALY,
+)
+
+
+def severity_grid(cvd_severity, severity_step):
+    """
+    Returns severities in the CVD tables, every `severity_step` down from and
+    including `cvd_severity`, in increasing order.
+    """
+    return np.arange(cvd_severity, 0, -severity_step, dtype=np.int64)[::-1].copy()
+
+
+@numba.njit(cache=True)
+def calc_cvd_jab_colors(rgb_linear, cvd_severity):
+    """
+    Calculates CAM02-UCS colors of a linear RGB color for each CVD type, in the
+    order deuteranomaly, protanomaly, tritanomaly, and for each severity from 1
+    to `cvd_severity`.
+    """
+    cvd_jab_colors = np.empty((3, cvd_severity, 3), dtype=np.float32)
+    for t in range(3):
+        cvd_rgb_linear = color_conversions.CVD_forward_all_severities(
+            rgb_linear, CVD_TYPES[t]
+        )
+        for s in range(1, cvd_severity + 1):
+            cvd_jab_colors[t, s - 1] = color_conversions.rgb_linear_to_jab(
+                cvd_rgb_linear[s]
+            )
+    return cvd_jab_colors
+
+
+@numba.njit(cache=True)
+def calc_rgb_linear(rgb_colors):
+    """
+    Converts 8-bit RGB colors to linear RGB.
+    """
+    return color_conversions.sRGB1_to_sRGB1_linear(
+        rgb_colors.flatten() / 255
+    ).reshape((-1, 3))
+
+
+@numba.njit(parallel=True, cache=True)
+def calc_jab_colors(min_j, max_j, severities, include_white):
+    """
+    Calculates CAM02-UCS colors for all 8-bit RGB colors with $J' \in [J'_{min}, J'_{max}]$,
+    with CVD colors for the given severities.
+    Also, optionally include white (#ffffff).
+    """
+    rgb_colors = all_rgb_colors()
+    rgb_linear = calc_rgb_linear(rgb_colors)
+    jab = color_conversions.rgb_linear_to_jab_parallel(rgb_linear)
+    valid = np.logical_and(jab[:, 0] >= min_j, jab[:, 0] <= max_j)
+    valid[-1] = valid[-1] or include_white
+    idx = np.nonzero(valid)[0]
+    rgb_colors = rgb_colors[idx]
+    jab_colors = jab[idx].astype(np.float32)
+    deut_jab_colors = np.empty((idx.size, severities.size, 3), dtype=np.float32)
+    prot_jab_colors = deut_jab_colors.copy()
+    trit_jab_colors = deut_jab_colors.copy()
+    for c in numba.prange(idx.size):
+        cvd_jab_colors = calc_cvd_jab_colors(rgb_linear[idx[c]], severities[-1])
+        for s in range(severities.size):
+            deut_jab_colors[c, s] = cvd_jab_colors[0, severities[s] - 1]
+            prot_jab_colors[c, s] = cvd_jab_colors[1, severities[s] - 1]
+            trit_jab_colors[c, s] = cvd_jab_colors[2, severities[s] - 1]
+    return rgb_colors, jab_colors, deut_jab_colors, prot_jab_colors, trit_jab_colors
+
+
+#
+# Generate color cycle
+#
+
+# Instead of recomputing the distance from every candidate color to every chosen
+# color at each step, a running minimum distance is kept for each candidate.
+# This running minimum is only brought up to date for candidates that could
+# still be the farthest one: the cheap normal-vision distance to the newly
+# chosen color is first folded into every candidate's running minimum, which
+# keeps it an upper bound on the candidate's exact minimum distance. The exact
+# minimum distance is then found for the candidate with the highest bound, which
+# gives a lower bound on the farthest distance, and the CVD distances only need
+# to be checked for the candidates whose upper bound is not below it. Since the
+# exact minimum distance of every candidate that ties for the farthest one is
+# found, the same color is chosen as by an exhaustive search.
+# If the CVD tables only contain a coarse grid of severities, the distances for
+# those severities also give an upper bound, so the CVD colors for all
+# severities only need to be recalculated for the candidates whose bound is
+# still not below the lower bound after checking the coarse grid. Since they are
+# calculated in the same way as for the full tables, the results are identical.
+
+
+@numba.njit(cache=True)
+def update_min_dist(j, num_chosen, min_dists_all, num_checked, colors_all, colors):
+    """
+    Updates running minimum distance of candidate color `j` with the distances
+    to the chosen colors it has not yet been checked against, for normal color
+    vision and for each CVD type and severity in the tables.
+    """
+    (
+        jab_colors_all,
+        deut_jab_colors_all,
+        prot_jab_colors_all,
+        trit_jab_colors_all,
+    ) = colors_all
+    jab_colors, deut_jab_colors, prot_jab_colors, trit_jab_colors = colors
+    dist = min_dists_all[j]
+    for k in range(num_checked[j], num_chosen):
+        dist = min(dist, color_conversions.cam02de(jab_colors_all[j], jab_colors[k]))
+        for s in range(deut_jab_colors.shape[1]):
+            dist = min(
+                dist,
+                color_conversions.cam02de(
+                    deut_jab_colors_all[j, s], deut_jab_colors[k, s]
+                ),
+            )
+            dist = min(
+                dist,
+                color_conversions.cam02de(
+                    prot_jab_colors_all[j, s], prot_jab_colors[k, s]
+                ),
+            )
+            dist = min(
+                dist,
+                color_conversions.cam02de(
+                    trit_jab_colors_all[j, s], trit_jab_colors[k, s]
+                ),
+            )
+    min_dists_all[j] = dist
+    num_checked[j] = num_chosen
+
+
+@numba.njit(cache=True)
+def refine_min_dist(
+    j, num_chosen, min_dists_all, num_exact, rgb_linear_all, cvd_jab_colors
+):
+    """
+    Updates running minimum distance of candidate color `j` with the distances
+    to the chosen colors it has not yet been exactly checked against, for each
+    CVD type and every severity, recalculating the candidate's CVD colors.
+    """
+    cvd_severity = cvd_jab_colors.shape[2]
+    cvd_jab_colors_j = calc_cvd_jab_colors(rgb_linear_all[j], cvd_severity)
+    dist = min_dists_all[j]
+    for k in range(num_exact[j], num_chosen):
+        for t in range(3):
+            for s in range(cvd_severity):
+                dist = min(
+                    dist,
+                    color_conversions.cam02de(
+                        cvd_jab_colors_j[t, s], cvd_jab_colors[k, t, s]
+                    ),
+                )
+    min_dists_all[j] = dist
+    num_exact[j] = num_chosen
+
+
+@numba.njit(cache=True)
+def check_candidate(
+    j,
+    num_chosen,
+    lower_bound,
+    min_dists_all,
+    num_checked,
+    num_exact,
+    colors_all,
+    colors,
+    rgb_linear_all,
+    cvd_jab_colors,
+):
+    """
+    Finds exact minimum distance of candidate color `j` to the chosen colors,
+    unless it is found to be below `lower_bound` first.
+    """
+    update_min_dist(j, num_chosen, min_dists_all, num_checked, colors_all, colors)
+    if rgb_linear_all.shape[0] == 0:
+        # Tables contain every severity, so the distance is already exact
+        num_exact[j] = num_chosen
+    elif min_dists_all[j] >= lower_bound:
+        refine_min_dist(
+            j, num_chosen, min_dists_all, num_exact, rgb_linear_all, cvd_jab_colors
+        )
+
+
+@numba.njit(parallel=True, cache=True)
+def gen_cycle(
+    rgb_colors_all,
+    jab_colors_all,
+    deut_jab_colors_all,
+    prot_jab_colors_all,
+    trit_jab_colors_all,
+    num_colors,
+    rgb_linear_all,
+    cvd_severity,
+):
+    """
+    Find optimal order using sequential method, starting with white.
+    If the CVD tables only contain a coarse grid of severities, the linear RGB
+    colors must be given in `rgb_linear_all`; otherwise, it should be empty.
+    """
+
+    num_all = rgb_colors_all.shape[0]
+    num_severities = deut_jab_colors_all.shape[1]
+    jab_colors = np.empty((num_colors, 3), dtype=np.float32)
+    deut_jab_colors = np.empty((num_colors, num_severities, 3), dtype=np.float32)
+    prot_jab_colors = deut_jab_colors.copy()
+    trit_jab_colors = deut_jab_colors.copy()
+    rgb_colors = np.empty((num_colors, 3), dtype=np.uint8)
+    min_dists = np.empty(num_colors, dtype=np.float32)
+    colors_all = (
+        jab_colors_all,
+        deut_jab_colors_all,
+        prot_jab_colors_all,
+        trit_jab_colors_all,
+    )
+    colors = (jab_colors, deut_jab_colors, prot_jab_colors, trit_jab_colors)
+
+    # CVD colors of the chosen colors for every severity, only needed if the
+    # tables only contain a coarse grid of severities
+    refine = rgb_linear_all.shape[0] > 0
+    cvd_jab_colors = np.empty(
+        (num_colors if refine else 0, 3, cvd_severity, 3), dtype=np.float32
+    )
+
+    # Running minimum distance of each candidate to the chosen colors, and the
+    # number of chosen colors it has been checked against, using the tables and
+    # exactly
+    min_dists_all = np.full(num_all, 1000.0)
+    num_checked = np.zeros(num_all, dtype=np.int32)
+    num_exact = np.zeros(num_all, dtype=np.int32)
+
+    # Start with white
+    rgb_colors[0] = rgb_colors_all[-1]
+    jab_colors[0] = jab_colors_all[-1]
+    deut_jab_colors[0] = deut_jab_colors_all[-1]
+    prot_jab_colors[0] = prot_jab_colors_all[-1]
+    trit_jab_colors[0] = trit_jab_colors_all[-1]
+    if refine:
+        cvd_jab_colors[0] = calc_cvd_jab_colors(rgb_linear_all[-1], cvd_severity)
+    min_dists[0] = 100
+
+    for i in range(1, num_colors):
+        # Tighten upper bounds with normal-vision distance to newest color
+        for j in numba.prange(num_all):
+            min_dists_all[j] = min(
+                min_dists_all[j],
+                color_conversions.cam02de(jab_colors_all[j], jab_colors[i - 1]),
+            )
+
+        # Lower bound on farthest distance from candidate with highest bound
+        bound_idx = np.argmax(min_dists_all)
+        check_candidate(
+            bound_idx,
+            i,
+            -np.inf,
+            min_dists_all,
+            num_checked,
+            num_exact,
+            colors_all,
+            colors,
+            rgb_linear_all,
+            cvd_jab_colors,
+        )
+        lower_bound = min_dists_all[bound_idx]
+
+        # Find exact distances of candidates that can reach lower bound
+        for j in numba.prange(num_all):
+            if num_exact[j] < i and min_dists_all[j] >= lower_bound:
+                check_candidate(
+                    j,
+                    i,
+                    lower_bound,
+                    min_dists_all,
+                    num_checked,
+                    num_exact,
+                    colors_all,
+                    colors,
+                    rgb_linear_all,
+                    cvd_jab_colors,
+                )
+
+        # Find farthest candidate
+        max_idx = 0
+        max_dist = 0.0
+        for j in range(num_all):
+            if num_exact[j] == i and min_dists_all[j] > max_dist:
+                max_dist = min_dists_all[j]
+                max_idx = j
+        rgb_colors[i] = rgb_colors_all[max_idx]
+        jab_colors[i] = jab_colors_all[max_idx]
+        deut_jab_colors[i] = deut_jab_colors_all[max_idx]
+        prot_jab_colors[i] = prot_jab_colors_all[max_idx]
+        trit_jab_colors[i] = trit_jab_colors_all[max_idx]
+        if refine:
+            cvd_jab_colors[i] = calc_cvd_jab_colors(
+                rgb_linear_all[max_idx], cvd_severity
+            )
+        min_dists[i] = max_dist
+
+    return rgb_colors, min_dists
+
+
+class SequentialCycleGenerator(object):
+    """
+    Generates maximally-distinct color cycles using the sequential-search method
+    of Glasbey et al. (2007), extended to use CAM02-UCS and CVD simulations for
+    every severity up to `cvd_severity`.
+
+    If `severity_step` is greater than one, the cached CVD tables only contain
+    every `severity_step`-th severity, which reduces their size by that factor,
+    while the generated cycles are unchanged.
+    """
+
+    def __init__(
+        self,
+        cvd_severity=100,
+        min_j=40,
+        max_j=90,
+        severity_step=1,
+        cache_dir=color_tables.CACHE_DIR,
+    ):
+        self.cvd_severity = int(cvd_severity)
+        self.min_j = int(min_j)
+        self.max_j = int(max_j)
+        self.severity_step = int(severity_step)
+        severities = severity_grid(self.cvd_severity, self.severity_step)
+        key = color_tables.cache_key("seq", self.min_j, self.max_j, self.cvd_severity)
+        key += "_white"
+        if self.severity_step > 1:
+            key += f"_step{self.severity_step}"
+        (
+            self.rgb_colors,
+            self.jab_colors,
+            self.deut_jab_colors,
+            self.prot_jab_colors,
+            self.trit_jab_colors,
+        ) = color_tables.load_tables(
+            key,
+            lambda: calc_jab_colors(self.min_j, self.max_j, severities, True),
+            cache_dir,
+        )
+        if severities.size < self.cvd_severity:
+            self.rgb_linear = calc_rgb_linear(np.asarray(self.rgb_colors))
+        else:
+            self.rgb_linear = np.empty((0, 3))
+
+    def gen_cycle(self, num_colors):
+        """
+        Generates color cycle with `num_colors` colors, starting with white.
+        Returns RGB colors and the minimum distance of each color to the colors
+        preceding it.
+        """
+        return gen_cycle(
+            self.rgb_colors,
+            self.jab_colors,
+            self.deut_jab_colors,
+            self.prot_jab_colors,
+            self.trit_jab_colors,
+            int(num_colors),
+            self.rgb_linear,
+            self.cvd_severity,
+        )
@@ -0,0 +1,181 @@
+"""
+Reading and writing files of generated color sets.
+
+Color sets are stored either as text, with `#`-prefixed header lines followed by
+one set of space-separated hex color codes per line, or in a binary format. The
+binary format is an uncompressed `.npz` file containing the colors as a
+`(num_sets, num_colors, 3)` array of sRGB255 `uint8` values and, as JSON, the
+header lines and the generation parameters. Since the file is uncompressed, the
+colors can be memory-mapped directly from it, without parsing or copying.
+
+Copyright (c) 2021 Matthew Petroff
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import re
+import struct
+import zipfile
+import numpy as np
+
+
+# Name of color set files written by `gen_color_sets.py`, which is also the
+# first header line, e.g., `colors_mcd18.0_mld4.2_nc8_cvd100_minj40_maxj82_ns10000_f`
+PARAMS_PATTERN = re.compile(
+    r"colors_mcd(?P<min_color_dist>[0-9.]+)_mld(?P<min_light_dist>[0-9.]+)"
+    + r"_nc(?P<num_colors>\d+)_cvd(?P<cvd_severity>\d+)"
+    + r"_minj(?P<min_j>\d+)_maxj(?P<max_j>\d+)_ns(?P<num_sets>\d+)"
+    + r"(?P<fixed>_f)?(?P<exact>_e)?$"
+)
+
+
+def parse_params(name):
+    """
+    Parses generation parameters from the name of a color set file; returns
+    `None` if the name does not match.
+    """
+    match = PARAMS_PATTERN.match(name)
+    if match is None:
+        return None
+    return {
+        "min_color_dist": float(match["min_color_dist"]),
+        "min_light_dist": float(match["min_light_dist"]),
+        "num_colors": int(match["num_colors"]),
+        "cvd_severity": int(match["cvd_severity"]),
+        "min_j": int(match["min_j"]),
+        "max_j": int(match["max_j"]),
+        "num_sets": int(match["num_sets"]),
+        "include_bug": match["fixed"] is None,
+        "exact_sampling": match["exact"] is not None,
+    }
+
+
+# Hex digits for each value and, inversely, the value of each ASCII hex digit,
+# with 255 for characters that are not hex digits
+HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+HEX_VALUES = np.full(256, 255, dtype=np.uint8)
+HEX_VALUES[HEX_DIGITS] = np.arange(16)
+HEX_VALUES[np.frombuffer(b"ABCDEF", dtype=np.uint8)] = np.arange(10, 16)
+
+
+def hex_to_rgb(colors):
+    """
+    Converts hex color codes (without `#`) to sRGB255; shape=(..., 3). Raises
+    `ValueError` for codes that are not exactly six hex digits.
+    """
+    # Codes longer than six characters keep a seventh character, while shorter
+    # codes are padded with null bytes
+    colors = np.asarray(colors, dtype="S7")
+    digits = np.frombuffer(colors.tobytes(), dtype=np.uint8)
+    digits = digits.reshape(colors.shape + (7,))
+    values = HEX_VALUES[digits[..., :6]]
+    valid = np.all(values < 16, axis=-1) & (digits[..., 6] == 0)
+    if not np.all(valid):
+        code = colors[~valid][0].decode()
+        raise ValueError(f"Invalid hex color code: {code}")
+    return values[..., 0::2] << 4 | values[..., 1::2]
+
+
+def read_color_sets_txt(filename):
+    """
+    Reads a text color set file; returns colors with
+    shape=(num_sets, num_colors, 3) and header lines (without `# `).
+    """
+    header = []
+    rows = []
+    with open(filename) as infile:
+        for line in infile:
+            if line.startswith("#"):
+                header.append(line[1:].strip())
+            elif line.strip():
+                rows.append(line.split())
+    return hex_to_rgb(rows), header
+
+
+def write_color_sets_txt(filename, colors, header=()):
+    """
+    Writes a text color set file; colors have shape=(num_sets, num_colors, 3).
+    """
+    # Format all colors at once as hex digits followed by a space, or by a new
+    # line for the last color in each set
+    colors = np.asarray(colors, dtype=np.uint8)
+    chars = np.empty(colors.shape[:-1] + (7,), dtype=np.uint8)
+    chars[..., 0:6:2] = HEX_DIGITS[colors >> 4]
+    chars[..., 1:6:2] = HEX_DIGITS[colors & 0xF]
+    chars[..., 6] = ord(" ")
+    chars[:, -1, 6] = ord("\n")
+    with open(filename, "w") as outfile:
+        for line in header:
+            outfile.write(f"# {line}\n")
+        outfile.write(chars.tobytes().decode("ascii"))
+
+
+def save_color_sets(filename, colors, header=(), params=None):
+    """
+    Writes a binary color set file; colors have shape=(num_sets, num_colors, 3).
+    If `params` is not given, it is parsed from the first header line.
+    """
+    header = list(header)
+    if params is None and len(header) > 0:
+        params = parse_params(header[0])
+    metadata = json.dumps({"header": header, "params": params})
+    np.savez(
+        filename,
+        colors=np.ascontiguousarray(colors, dtype=np.uint8),
+        metadata=np.array(metadata),
+    )
+
+
+def load_color_sets(filename, mmap_mode="r"):
+    """
+    Reads a binary color set file; returns colors with
+    shape=(num_sets, num_colors, 3), which are memory-mapped unless `mmap_mode`
+    is `None`, and metadata with the header lines and generation parameters.
+    """
+    with np.load(filename) as npz_file:
+        metadata = json.loads(str(npz_file["metadata"]))
+        if mmap_mode is None:
+            return npz_file["colors"], metadata
+
+    # Find start of array data, which follows the local file header of the
+    # archive member and the NPY header
+    with zipfile.ZipFile(filename) as archive:
+        info = archive.getinfo("colors.npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError("Compressed color set files cannot be memory-mapped")
+    with open(filename, "rb") as infile:
+        infile.seek(info.header_offset)
+        local_header = infile.read(30)
+        name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+        infile.seek(name_length + extra_length, 1)
+        version = np.lib.format.read_magic(infile)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(infile)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(infile)
+        offset = infile.tell()
+    colors = np.memmap(
+        filename,
+        dtype=dtype,
+        mode=mmap_mode,
+        offset=offset,
+        shape=shape,
+        order="F" if fortran_order else "C",
+    )
+    return colors, metadata
@@ -0,0 +1,133 @@
+"""
+Spatial indices for finding colors close to a given color in CAM02-UCS.
+
+A uniform grid over J'a'b' is used for perceptual distances, and a sorted index
+is used for lightness distances. Instead of scanning every color, queries only
+visit the colors that fall within the grid cells (or the range of sorted values)
+overlapping the query radius, and then check the exact distance for each of
+them. Colors that are found are marked as invalid in a boolean array, so the set
+of remaining candidate colors can be narrowed down without copying it.
+
+Copyright (c) 2021 Matthew Petroff
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+import numba
+
+
+# Query ranges are padded slightly, so colors that are right at the query
+# radius are always checked, regardless of rounding errors
+RANGE_PAD = 1e-3
+
+
+@numba.njit(cache=True)
+def build_grid(points, cell_size):
+    """
+    Builds a uniform grid over points with shape (n, 3). Returns a tuple of the
+    grid origin, cell size, grid shape, start index of each cell's points, and
+    the point indices sorted by cell.
+    """
+    origin = np.empty(3)
+    shape = np.empty(3, dtype=np.int64)
+    for d in range(3):
+        origin[d] = np.min(points[:, d])
+        shape[d] = int((np.max(points[:, d]) - origin[d]) / cell_size) + 1
+    num_cells = shape[0] * shape[1] * shape[2]
+
+    # Counting sort of points by cell
+    cells = np.empty(points.shape[0], dtype=np.int64)
+    cell_start = np.zeros(num_cells + 1, dtype=np.int64)
+    for i in range(points.shape[0]):
+        cell = 0
+        for d in range(3):
+            cell = cell * shape[d] + min(
+                int((points[i, d] - origin[d]) / cell_size), shape[d] - 1
+            )
+        cells[i] = cell
+        cell_start[cell + 1] += 1
+    cell_start = np.cumsum(cell_start)
+    cell_items = np.empty(points.shape[0], dtype=np.int32)
+    fill = cell_start[:-1].copy()
+    for i in range(points.shape[0]):
+        cell_items[fill[cells[i]]] = i
+        fill[cells[i]] += 1
+
+    return origin, cell_size, shape, cell_start, cell_items
+
+
+@numba.njit(cache=True)
+def remove_within_grid(grid, points, center, radius, valid):
+    """
+    Marks points that are still valid, but closer than `radius` to `center`,
+    as no longer valid. Returns the number of points that were marked.
+    """
+    origin, cell_size, shape, cell_start, cell_items = grid
+    lo = np.empty(3, dtype=np.int64)
+    hi = np.empty(3, dtype=np.int64)
+    for d in range(3):
+        lo[d] = max(
+            int(np.floor((center[d] - radius - RANGE_PAD - origin[d]) / cell_size)), 0
+        )
+        hi[d] = min(
+            int(np.floor((center[d] + radius + RANGE_PAD - origin[d]) / cell_size)),
+            shape[d] - 1,
+        )
+    removed = 0
+    for i in range(lo[0], hi[0] + 1):
+        for j in range(lo[1], hi[1] + 1):
+            for k in range(lo[2], hi[2] + 1):
+                cell = (i * shape[1] + j) * shape[2] + k
+                for idx in cell_items[cell_start[cell] : cell_start[cell + 1]]:
+                    if valid[idx]:
+                        d0 = points[idx, 0] - center[0]
+                        d1 = points[idx, 1] - center[1]
+                        d2 = points[idx, 2] - center[2]
+                        if np.sqrt(d0 * d0 + d1 * d1 + d2 * d2) < radius:
+                            valid[idx] = False
+                            removed += 1
+    return removed
+
+
+@numba.njit(cache=True)
+def build_sorted_index(values):
+    """
+    Builds a sorted index over the given values. Returns a tuple of the sorted
+    values and their original indices.
+    """
+    order = np.argsort(values, kind="mergesort")
+    return values[order], order.astype(np.int32)
+
+
+@numba.njit(cache=True)
+def remove_within_sorted(index, center, radius, valid):
+    """
+    Marks values that are still valid, but closer than `radius` to `center`,
+    as no longer valid. Returns the number of values that were marked.
+    """
+    sorted_values, order = index
+    start = np.searchsorted(sorted_values, center - radius - RANGE_PAD)
+    stop = np.searchsorted(sorted_values, center + radius + RANGE_PAD, side="right")
+    removed = 0
+    for k in range(start, stop):
+        idx = order[k]
+        if valid[idx] and np.abs(sorted_values[k] - center) < radius:
+            valid[idx] = False
+            removed += 1
+    return removed
@@ -0,0 +1,9 @@
+"""
+Makes the modules in the `set-generation` directory and the `set_generation`
+package importable when running the tests from any directory.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
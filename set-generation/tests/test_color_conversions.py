@@ -0,0 +1,102 @@
+"""
+Tests for the batched and parallel color conversions, against the single-color
+functions.
+"""
+
+import numpy as np
+import pytest
+import color_conversions
+
+
+def random_rgb_linear(num_colors=500, seed=0):
+    rng = np.random.default_rng(seed)
+    rgb = rng.integers(0, 256, (num_colors, 3))
+    rgb[:8] = [[0, 0, 0], [255, 255, 255], [255, 0, 0], [0, 255, 0]] * 2
+    return np.array(
+        [color_conversions.sRGB1_to_sRGB1_linear(c / 255) for c in rgb]
+    )
+
+
+def test_batch_conversions():
+    rgb_linear = random_rgb_linear()
+    expected = np.array([color_conversions.rgb_linear_to_jab(c) for c in rgb_linear])
+    jab = color_conversions.rgb_linear_to_jab_batch(rgb_linear)
+    np.testing.assert_allclose(jab, expected, rtol=1e-10, atol=1e-10)
+
+    expected = np.array([color_conversions.jab_to_rgb_linear(c) for c in jab])
+    np.testing.assert_allclose(
+        color_conversions.jab_to_rgb_linear_batch(jab), expected, atol=1e-10
+    )
+    np.testing.assert_allclose(expected, rgb_linear, atol=1e-10)
+
+
+def test_parallel_conversions_are_identical():
+    rgb_linear = random_rgb_linear()
+    expected = np.array([color_conversions.rgb_linear_to_jab(c) for c in rgb_linear])
+    jab = color_conversions.rgb_linear_to_jab_parallel(rgb_linear)
+    np.testing.assert_array_equal(jab, expected)
+    np.testing.assert_array_equal(
+        color_conversions.jab_to_rgb_linear_parallel(jab),
+        np.array([color_conversions.jab_to_rgb_linear(c) for c in jab]),
+    )
+
+
+def test_gufuncs_are_built_once_and_identical():
+    rgb_linear = random_rgb_linear(50)
+    gufunc = color_conversions.rgb_linear_to_jab_gufunc()
+    assert gufunc is color_conversions.rgb_linear_to_jab_gufunc()
+    jab = gufunc(rgb_linear)
+    np.testing.assert_array_equal(
+        jab, color_conversions.rgb_linear_to_jab_parallel(rgb_linear)
+    )
+    np.testing.assert_array_equal(
+        color_conversions.jab_to_rgb_linear_gufunc()(jab),
+        color_conversions.jab_to_rgb_linear_parallel(jab),
+    )
+
+
+def naive_min_set_distances(sRGB1, severities):
+    """
+    Minimum distances for each set using the single-color functions.
+    """
+    min_dists = np.full((sRGB1.shape[0], 4), np.inf)
+    for s, colors in enumerate(sRGB1):
+        rgb_linear = [color_conversions.sRGB1_to_sRGB1_linear(c) for c in colors]
+        views = [[color_conversions.rgb_linear_to_jab(c) for c in rgb_linear]]
+        for cvd_type in range(3):
+            for severity in severities:
+                views.append(
+                    [
+                        color_conversions.rgb_linear_to_jab(
+                            color_conversions.CVD_forward(c, cvd_type, severity)
+                        )
+                        for c in rgb_linear
+                    ]
+                )
+        for v, jab in enumerate(views):
+            column = 0 if v == 0 else 1 + (v - 1) // len(severities)
+            for i in range(len(jab)):
+                for j in range(i):
+                    min_dists[s, column] = min(
+                        min_dists[s, column], color_conversions.cam02de(jab[i], jab[j])
+                    )
+    return min_dists
+
+
+def test_min_set_distances():
+    rng = np.random.default_rng(3)
+    sRGB255 = rng.integers(0, 256, (12, 5, 3), dtype=np.uint8)
+    severities = np.array([1, 50, 100])
+    expected = naive_min_set_distances(sRGB255 / 255, severities)
+    np.testing.assert_allclose(
+        color_conversions.min_set_distances(sRGB255 / 255, severities),
+        expected,
+        rtol=1e-9,
+    )
+    # uint8 colors are converted from sRGB255
+    np.testing.assert_array_equal(
+        color_conversions.min_set_distances(sRGB255, severities),
+        color_conversions.min_set_distances(sRGB255 / 255, severities),
+    )
+    with pytest.raises(TypeError):
+        color_conversions.min_set_distances(sRGB255.astype(np.int64), severities)
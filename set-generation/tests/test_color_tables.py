@@ -0,0 +1,49 @@
+"""
+Tests for the on-disk cache of color tables.
+"""
+
+import os
+import numpy as np
+import color_tables
+
+
+def test_load_tables_caches_memory_maps(tmp_path):
+    calls = []
+
+    def calc_tables():
+        calls.append(1)
+        return np.arange(6, dtype=np.uint8).reshape((2, 3)), np.linspace(0, 1, 4)
+
+    names = ("a", "b")
+    first = color_tables.load_tables("key", calc_tables, str(tmp_path), names)
+    second = color_tables.load_tables("key", calc_tables, str(tmp_path), names)
+
+    # Tables are only calculated once, and no temporary files are left behind
+    assert len(calls) == 1
+    assert sorted(os.listdir(tmp_path)) == ["key_a.npy", "key_b.npy"]
+    for table, expected in zip(second, calc_tables()):
+        assert isinstance(table, np.memmap)
+        assert not table.flags.writeable
+        assert table.dtype == expected.dtype
+        np.testing.assert_array_equal(table, expected)
+    for table, cached in zip(first, second):
+        np.testing.assert_array_equal(table, cached)
+
+
+def test_load_tables_recalculates_missing_table(tmp_path):
+    calls = []
+
+    def calc_tables():
+        calls.append(1)
+        return (np.zeros(3), np.ones(3))
+
+    names = ("a", "b")
+    color_tables.load_tables("key", calc_tables, str(tmp_path), names)
+    os.remove(tmp_path / "key_b.npy")
+    (a, b) = color_tables.load_tables("key", calc_tables, str(tmp_path), names)
+    assert len(calls) == 2
+    np.testing.assert_array_equal(b, np.ones(3))
+
+
+def test_cache_key():
+    assert color_tables.cache_key("sets", 40, 90, 100) == "sets_cvd100_minj40_maxj90"
@@ -0,0 +1,137 @@
+"""
+Tests for the set-generation kernels, against straightforward references.
+"""
+
+import numba
+import numpy as np
+import pytest
+import colorspacious
+import color_conversions
+from set_generation import generator
+
+
+@numba.njit
+def seed_numba(seed):
+    np.random.seed(seed)
+
+
+def test_rgb_index():
+    rng = np.random.default_rng(0)
+    rgb_colors = np.unique(rng.integers(0, 256, (1000, 3), dtype=np.uint8), axis=0)
+    rgb_index = generator.build_rgb_index(rgb_colors)
+    for i, rgb in enumerate(rgb_colors):
+        packed = int(rgb[0]) + 256 * int(rgb[1]) + 256 ** 2 * int(rgb[2])
+        assert generator.pack_rgb(rgb) == packed
+        assert rgb_index[packed] == i
+    assert np.count_nonzero(rgb_index != generator.NO_COLOR) == len(rgb_colors)
+
+
+def test_sample_valid_is_volume_weighted():
+    valid = np.array([False, True, True, False, True, True])
+    jab_volumes = np.array([5.0, 1.0, 2.0, 5.0, 3.0, 4.0], dtype=np.float32)
+    num_samples = 20000
+    seed_numba(0)
+    picks = [generator.sample_valid(valid, jab_volumes) for _ in range(num_samples)]
+    counts = np.bincount(picks, minlength=valid.size)
+    expected = np.where(valid, jab_volumes, 0) / np.sum(jab_volumes[valid])
+    assert np.all(counts[~valid] == 0)
+    np.testing.assert_allclose(
+        counts / num_samples,
+        expected,
+        atol=4 * np.sqrt(0.25 / num_samples),
+    )
+
+
+def test_jab_volumes():
+    rgb_colors = np.array(
+        [[1, 1, 1], [255, 255, 255], [128, 64, 32], [12, 200, 99]], dtype=np.uint8
+    )
+    volumes = generator.calc_jab_volumes(rgb_colors)
+    for rgb, volume in zip(rgb_colors, volumes):
+        jacobian = np.empty((3, 3))
+        for d in range(3):
+            step = np.zeros(3)
+            step[d] = 0.5
+            jacobian[:, d] = colorspacious.cspace_convert(
+                rgb + step, "sRGB255", "CAM02-UCS"
+            ) - colorspacious.cspace_convert(rgb - step, "sRGB255", "CAM02-UCS")
+        assert volume == pytest.approx(abs(np.linalg.det(jacobian)), rel=1e-4)
+
+
+@pytest.mark.parametrize("max_severity", [2, 17, 50, 100])
+def test_severity_schedule(max_severity):
+    schedule = generator.severity_schedule(max_severity)
+    assert sorted(schedule) == list(range(1, max_severity))
+    assert schedule[0] == max_severity - 1
+
+
+def naive_check_color_set(rgb_colors, max_severity, min_color_dist):
+    """
+    Checks every CVD type and severity below `max_severity` in order.
+    """
+    rgb_linear = [
+        color_conversions.sRGB1_to_sRGB1_linear(c / 255) for c in rgb_colors
+    ]
+    for severity in range(1, max_severity):
+        for cvd_type in range(3):
+            jab = [
+                color_conversions.rgb_linear_to_jab(
+                    color_conversions.CVD_forward(c, cvd_type, severity)
+                )
+                for c in rgb_linear
+            ]
+            for i in range(len(jab)):
+                for j in range(i):
+                    if color_conversions.cam02de(jab[i], jab[j]) < min_color_dist:
+                        return False
+    return True
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_check_color_set(seed):
+    rng = np.random.default_rng(seed)
+    rgb_colors = rng.integers(0, 256, (4, 3), dtype=np.uint8)
+    severities = generator.severity_schedule(100)
+    for min_color_dist in (5.0, 10.0, 20.0):
+        assert generator.check_color_set(
+            rgb_colors, severities, min_color_dist
+        ) == naive_check_color_set(rgb_colors, 100, min_color_dist)
+
+
+def test_machado_matrices():
+    matrix_funcs = (
+        color_conversions.machado_et_al_2009_matrix_protanomaly,
+        color_conversions.machado_et_al_2009_matrix_deuteranomaly,
+        color_conversions.machado_et_al_2009_matrix_tritanomaly,
+    )
+    for cvd_type, matrix_func in enumerate(matrix_funcs):
+        for severity in range(101):
+            np.testing.assert_array_equal(
+                color_conversions.MACHADO_ET_AL_MATRICES[cvd_type, severity],
+                matrix_func(severity),
+            )
+
+
+def test_cvd_forward():
+    rng = np.random.default_rng(0)
+    cvd_types = ("protanomaly", "deuteranomaly", "tritanomaly")
+    for rgb in rng.random((5, 3)):
+        rgb_linear = color_conversions.sRGB1_to_sRGB1_linear(rgb)
+        all_severities = [
+            color_conversions.CVD_forward_all_severities(rgb_linear, cvd_type)
+            for cvd_type in range(3)
+        ]
+        for severity in (0, 1, 37, 99, 100):
+            for cvd_type, name in enumerate(cvd_types):
+                expected = colorspacious.cspace_convert(
+                    rgb,
+                    {"name": "sRGB1+CVD", "cvd_type": name, "severity": severity},
+                    "sRGB1",
+                )
+                cvd = color_conversions.CVD_forward(rgb_linear, cvd_type, severity)
+                np.testing.assert_allclose(
+                    color_conversions.sRGB1_linear_to_sRGB1(cvd), expected, atol=1e-6
+                )
+                np.testing.assert_allclose(
+                    all_severities[cvd_type][severity], cvd, rtol=1e-15, atol=1e-15
+                )
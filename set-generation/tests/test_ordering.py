@@ -0,0 +1,94 @@
+"""
+Tests for optimal cycle ordering, against scoring every permutation.
+"""
+
+import itertools
+import numpy as np
+import pytest
+import color_conversions
+from set_generation import ordering
+
+
+def brute_force_order(rgb_colors, names=None, background_name=-1, first=None):
+    """
+    Scores every ordering of the colors, with white as the background, and
+    returns the best allowed ordering (the first one in lexicographic order if
+    there are ties) and its score.
+    """
+    num_colors = len(rgb_colors)
+    colors = np.concatenate(([[255, 255, 255]], rgb_colors))
+    dist, light_dist = ordering.calc_distance_tables(colors, 100)
+    if names is not None:
+        names = [background_name] + list(names)
+        unique_name_count = len(set(names[1:]))
+    best_order, best_score = None, 0.0
+    for order in itertools.permutations(range(num_colors)):
+        if first is not None and order[0] != first:
+            continue
+        allowed = True
+        score = 0.0
+        for k in range(1, num_colors + 1):
+            prefix = [0] + [i + 1 for i in order[:k]]
+            pairs = list(itertools.combinations(prefix, 2))
+            score += min(dist[i, j] for i, j in pairs) * min(
+                light_dist[i, j] for i, j in pairs
+            )
+            if names is not None and k < num_colors and k <= unique_name_count:
+                prefix_names = [names[i] for i in prefix]
+                allowed &= len(set(prefix_names)) == len(prefix_names)
+        score /= num_colors
+        if allowed and (best_order is None or score > best_score):
+            best_order, best_score = order, score
+    return best_order, best_score
+
+
+def test_calc_distance_tables():
+    rng = np.random.default_rng(0)
+    colors = rng.integers(0, 256, (6, 3))
+    dist, light_dist = ordering.calc_distance_tables(colors, 100)
+    for i in range(6):
+        for j in range(6):
+            rgb_linear = [
+                color_conversions.sRGB1_to_sRGB1_linear(colors[k] / 255)
+                for k in (i, j)
+            ]
+            jab = [color_conversions.rgb_linear_to_jab(c) for c in rgb_linear]
+            expected = color_conversions.cam02de(jab[0], jab[1])
+            for cvd_type in range(3):
+                cvd_jab = [
+                    color_conversions.rgb_linear_to_jab(
+                        color_conversions.CVD_forward(c, cvd_type, 100)
+                    )
+                    for c in rgb_linear
+                ]
+                expected = min(
+                    expected, color_conversions.cam02de(cvd_jab[0], cvd_jab[1])
+                )
+            assert dist[i, j] == pytest.approx(expected, abs=1e-12)
+            assert light_dist[i, j] == pytest.approx(abs(jab[0][0] - jab[1][0]))
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_optimal_cycle_order_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    rgb_colors = rng.integers(0, 256, (6, 3))
+    order, score = ordering.optimal_cycle_order(rgb_colors)
+    expected_order, expected_score = brute_force_order(rgb_colors)
+    assert tuple(order) == expected_order
+    assert score == pytest.approx(expected_score)
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_optimal_cycle_order_with_names(seed):
+    rng = np.random.default_rng(seed)
+    rgb_colors = rng.integers(0, 256, (6, 3))
+    names = rng.integers(0, 4, 6)
+    first = int(rng.integers(0, 6))
+    for kwargs in ({}, {"background_name": names[0]}, {"first": first}):
+        order, score = ordering.optimal_cycle_order(rgb_colors, names, **kwargs)
+        expected_order, expected_score = brute_force_order(rgb_colors, names, **kwargs)
+        if expected_order is None:
+            assert order is None and score == 0
+        else:
+            assert tuple(order) == expected_order
+            assert score == pytest.approx(expected_score)
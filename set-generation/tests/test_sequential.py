@@ -0,0 +1,132 @@
+"""
+Tests for the sequential-search cycle generator, against an exhaustive search.
+"""
+
+import numpy as np
+import pytest
+import color_conversions
+from set_generation import sequential
+
+CVD_SEVERITY = 6
+
+
+def make_tables(num_colors=150, seed=0):
+    """
+    Builds small color tables of random colors, ending with white, with CVD
+    colors for every severity up to `CVD_SEVERITY`.
+    """
+    rng = np.random.default_rng(seed)
+    rgb_colors = rng.integers(0, 256, (num_colors, 3), dtype=np.uint8)
+    rgb_colors[-1] = 255
+    rgb_linear = sequential.calc_rgb_linear(rgb_colors)
+    jab_colors = np.array(
+        [color_conversions.rgb_linear_to_jab(c) for c in rgb_linear], dtype=np.float32
+    )
+    cvd_jab_colors = np.array(
+        [sequential.calc_cvd_jab_colors(c, CVD_SEVERITY) for c in rgb_linear]
+    )
+    return rgb_colors, rgb_linear, jab_colors, cvd_jab_colors
+
+
+def exact_min_dist(jab_colors, cvd_jab_colors, j, chosen):
+    """
+    Exact minimum distance of color `j` to the chosen colors, for normal color
+    vision and for every CVD type and severity.
+    """
+    dist = np.inf
+    for k in chosen:
+        dist = min(dist, color_conversions.cam02de(jab_colors[j], jab_colors[k]))
+        dist = min(
+            dist,
+            np.min(color_conversions.cam02de(cvd_jab_colors[j], cvd_jab_colors[k])),
+        )
+    return dist
+
+
+def exhaustive_cycle(jab_colors, cvd_jab_colors, num_colors):
+    """
+    Sequential search that checks every candidate exactly, starting with white
+    and breaking ties in favor of the lowest index.
+    """
+    chosen = [jab_colors.shape[0] - 1]
+    for _ in range(1, num_colors):
+        dists = [
+            exact_min_dist(jab_colors, cvd_jab_colors, j, chosen)
+            for j in range(jab_colors.shape[0])
+        ]
+        chosen.append(int(np.argmax(dists)))
+    return chosen
+
+
+def coarse_tables(cvd_jab_colors, severity_step):
+    """
+    CVD tables for every `severity_step`-th severity, in the order
+    deuteranomaly, protanomaly, tritanomaly.
+    """
+    severities = sequential.severity_grid(CVD_SEVERITY, severity_step)
+    return tuple(
+        np.ascontiguousarray(cvd_jab_colors[:, t, severities - 1]) for t in range(3)
+    )
+
+
+@pytest.mark.parametrize("severity_step", [1, 2, 4])
+def test_gen_cycle_matches_exhaustive_search(severity_step):
+    rgb_colors, rgb_linear, jab_colors, cvd_jab_colors = make_tables()
+    expected = exhaustive_cycle(jab_colors, cvd_jab_colors, 6)
+
+    # Tables with a coarse grid of severities need the linear RGB colors
+    if severity_step > 1:
+        rgb_linear_all = rgb_linear
+    else:
+        rgb_linear_all = np.empty((0, 3))
+    cycle, min_dists = sequential.gen_cycle(
+        rgb_colors,
+        jab_colors,
+        *coarse_tables(cvd_jab_colors, severity_step),
+        6,
+        rgb_linear_all,
+        CVD_SEVERITY,
+    )
+
+    np.testing.assert_array_equal(cycle, rgb_colors[expected])
+    for i in range(1, 6):
+        assert min_dists[i] == pytest.approx(
+            exact_min_dist(jab_colors, cvd_jab_colors, expected[i], expected[:i]),
+            rel=1e-6,
+        )
+
+
+@pytest.mark.parametrize("lower_bound", [-np.inf, 10.0, 20.0, np.inf])
+def test_check_candidate_bounds(lower_bound):
+    rgb_colors, rgb_linear, jab_colors, cvd_jab_colors = make_tables(60, seed=1)
+    chosen = np.array([59, 3, 17, 42])
+    colors_all = (jab_colors,) + coarse_tables(cvd_jab_colors, 3)
+    colors = tuple(np.ascontiguousarray(table[chosen]) for table in colors_all)
+    chosen_cvd_jab_colors = np.ascontiguousarray(cvd_jab_colors[chosen])
+
+    min_dists_all = np.full(jab_colors.shape[0], 1000.0)
+    num_checked = np.zeros(jab_colors.shape[0], dtype=np.int32)
+    num_exact = np.zeros(jab_colors.shape[0], dtype=np.int32)
+    for j in range(jab_colors.shape[0]):
+        # Check against the chosen colors in two steps, as `gen_cycle` does
+        for num_chosen in (2, chosen.size):
+            sequential.check_candidate(
+                j,
+                num_chosen,
+                lower_bound,
+                min_dists_all,
+                num_checked,
+                num_exact,
+                colors_all,
+                colors,
+                rgb_linear,
+                chosen_cvd_jab_colors,
+            )
+        exact = exact_min_dist(jab_colors, cvd_jab_colors, j, chosen)
+        # The running minimum is always an upper bound, and it is exact unless
+        # it is below the lower bound
+        assert num_checked[j] == chosen.size
+        assert min_dists_all[j] >= exact * (1 - 1e-6)
+        if min_dists_all[j] >= lower_bound:
+            assert num_exact[j] == chosen.size
+            assert min_dists_all[j] == pytest.approx(exact, rel=1e-6)
@@ -0,0 +1,138 @@
+"""
+Tests for reading and writing color set files.
+"""
+
+import json
+import os
+import sys
+import numpy as np
+import pytest
+from set_generation import set_files
+
+HEADER = [
+    "colors_mcd18.0_mld4.2_nc8_cvd100_minj40_maxj82_ns10000_f",
+    "Python 3.8.5",
+    "NumPy 1.19.5, Numba 0.53.1",
+]
+
+VALID_CODES = ["000000", "ffffff", "FFFFFF", "0a1B2c", "9f8e7d", "a0B0c0"]
+INVALID_CODES = ["", "fff", "fffff", "fffffff", "ffgg00", "ff ff0", "0x1234", "#fffff"]
+
+
+def random_sets(num_sets=50, num_colors=8, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, (num_sets, num_colors, 3), dtype=np.uint8)
+
+
+def test_hex_to_rgb():
+    rgb = set_files.hex_to_rgb([VALID_CODES])
+    expected = [[[int(c[i : i + 2], 16) for i in (0, 2, 4)] for c in VALID_CODES]]
+    np.testing.assert_array_equal(rgb, expected)
+    assert rgb.dtype == np.uint8
+    for code in INVALID_CODES:
+        with pytest.raises(ValueError):
+            set_files.hex_to_rgb([VALID_CODES[0], code])
+
+
+def test_hex_to_rgb_matches_numpy_model():
+    # `aesthetic-models/numpy-version/numpy_model.py` has its own parser, since
+    # the package cannot import from there, so the two must agree
+    pytest.importorskip("colorspacious")
+    sys.path.insert(
+        0,
+        os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            "..",
+            "..",
+            "aesthetic-models",
+            "numpy-version",
+        ),
+    )
+    try:
+        import numpy_model
+    finally:
+        sys.path.pop(0)
+
+    rng = np.random.default_rng(0)
+    codes = ["%06x" % v for v in rng.integers(0, 2 ** 24, 1000)] + VALID_CODES
+    np.testing.assert_array_equal(
+        set_files.hex_to_rgb(codes), numpy_model.hex_to_rgb(codes)
+    )
+    for code in INVALID_CODES:
+        with pytest.raises(ValueError):
+            numpy_model.hex_to_rgb([code])
+
+
+def test_text_round_trip(tmp_path):
+    colors = random_sets()
+    filename = str(tmp_path / "sets.txt")
+    set_files.write_color_sets_txt(filename, colors, HEADER)
+    with open(filename) as infile:
+        lines = infile.read().splitlines()
+    assert lines[:3] == [f"# {line}" for line in HEADER]
+    assert lines[3] == " ".join("%02x%02x%02x" % tuple(c) for c in colors[0])
+
+    read_colors, read_header = set_files.read_color_sets_txt(filename)
+    np.testing.assert_array_equal(read_colors, colors)
+    assert read_header == HEADER
+
+
+@pytest.mark.parametrize("mmap_mode", ["r", None])
+def test_binary_round_trip(tmp_path, mmap_mode):
+    colors = random_sets()
+    filename = str(tmp_path / "sets.npz")
+    set_files.save_color_sets(filename, colors, HEADER)
+    loaded, metadata = set_files.load_color_sets(filename, mmap_mode)
+    assert isinstance(loaded, np.memmap) == (mmap_mode is not None)
+    assert loaded.dtype == np.uint8
+    np.testing.assert_array_equal(loaded, colors)
+    assert metadata["header"] == HEADER
+    assert metadata["params"] == set_files.parse_params(HEADER[0])
+
+
+def test_binary_memmap_after_other_members(tmp_path):
+    # The colors are found by their offset in the archive, so they can be
+    # memory-mapped even if other members are stored before them
+    colors = random_sets(7, 5, seed=1)
+    filename = str(tmp_path / "sets.npz")
+    metadata = {"header": ["x" * 1000], "params": None}
+    np.savez(
+        filename,
+        metadata=np.array(json.dumps(metadata)),
+        padding=np.arange(12345, dtype=np.uint8),
+        colors=colors,
+    )
+    loaded, loaded_metadata = set_files.load_color_sets(filename)
+    assert isinstance(loaded, np.memmap)
+    np.testing.assert_array_equal(loaded, colors)
+    assert loaded_metadata == metadata
+
+
+def test_compressed_file_is_not_memory_mapped(tmp_path):
+    colors = random_sets()
+    filename = str(tmp_path / "sets.npz")
+    np.savez_compressed(
+        filename,
+        colors=colors,
+        metadata=np.array(json.dumps({"header": [], "params": None})),
+    )
+    with pytest.raises(ValueError):
+        set_files.load_color_sets(filename)
+    loaded, _ = set_files.load_color_sets(filename, mmap_mode=None)
+    np.testing.assert_array_equal(loaded, colors)
+
+
+def test_parse_params():
+    params = set_files.parse_params(HEADER[0])
+    assert params == {
+        "min_color_dist": 18.0,
+        "min_light_dist": 4.2,
+        "num_colors": 8,
+        "cvd_severity": 100,
+        "min_j": 40,
+        "max_j": 82,
+        "num_sets": 10000,
+        "include_bug": False,
+        "exact_sampling": False,
+    }
+    assert set_files.parse_params("Python 3.8.5") is None
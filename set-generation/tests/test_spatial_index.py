@@ -0,0 +1,66 @@
+"""
+Tests for the spatial indices, against brute-force searches.
+"""
+
+import numpy as np
+import pytest
+import spatial_index
+
+
+def brute_force_remove(points, center, radius, valid):
+    """
+    Brute-force version of the `remove_within_*` functions.
+    """
+    dist = np.sqrt(np.sum((points - center) ** 2, axis=-1))
+    within = valid & (dist < radius)
+    valid[within] = False
+    return np.count_nonzero(within)
+
+
+@pytest.mark.parametrize("cell_size", [5.0, 20.0, 200.0])
+def test_remove_within_grid(cell_size):
+    rng = np.random.default_rng(0)
+    points = (rng.random((2000, 3)) * [60, 80, 80] + [40, -40, -40]).astype(
+        np.float32
+    )
+    grid = spatial_index.build_grid(points, cell_size)
+    valid = rng.random(points.shape[0]) < 0.8
+    expected_valid = valid.copy()
+    # Centers inside and outside of the points' bounding box
+    for center in np.concatenate((points[:20], rng.random((20, 3)) * 300 - 100)):
+        center = center.astype(np.float64)
+        radius = rng.random() * 30
+        removed = spatial_index.remove_within_grid(grid, points, center, radius, valid)
+        expected = brute_force_remove(points, center, radius, expected_valid)
+        assert removed == expected
+        np.testing.assert_array_equal(valid, expected_valid)
+
+
+def test_build_grid_contains_each_point_once():
+    rng = np.random.default_rng(1)
+    points = rng.random((500, 3)) * 100
+    origin, cell_size, shape, cell_start, cell_items = spatial_index.build_grid(
+        points, 7.0
+    )
+    assert cell_start[0] == 0 and cell_start[-1] == points.shape[0]
+    assert np.all(np.diff(cell_start) >= 0)
+    np.testing.assert_array_equal(np.sort(cell_items), np.arange(points.shape[0]))
+
+
+def test_remove_within_sorted():
+    rng = np.random.default_rng(2)
+    values = (rng.random(2000) * 50 + 40).astype(np.float32)
+    # Include repeated values
+    values[::7] = values[0]
+    index = spatial_index.build_sorted_index(values)
+    valid = rng.random(values.size) < 0.8
+    expected_valid = valid.copy()
+    for center in np.concatenate((values[:20], rng.random(20) * 80 + 20)):
+        center = float(center)
+        radius = rng.random() * 5
+        removed = spatial_index.remove_within_sorted(index, center, radius, valid)
+        expected = brute_force_remove(
+            values[:, np.newaxis], center, radius, expected_valid
+        )
+        assert removed == expected
+        np.testing.assert_array_equal(valid, expected_valid)
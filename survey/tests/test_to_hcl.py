@@ -0,0 +1,67 @@
+"""
+Tests for sorting color set files by HCL, against sorting one set at a time.
+"""
+
+import sys
+import numpy as np
+import pytest
+import colorspacious
+import to_hcl
+
+
+def reference_sort(row):
+    """
+    Sorts a single color set, converting one color at a time.
+    """
+    rgb = [(int(i[:2], 16), int(i[2:4], 16), int(i[4:], 16)) for i in row]
+    jab = [colorspacious.cspace_convert(i, "sRGB255", "CAM02-UCS") for i in rgb]
+    hcl = np.array(
+        [[np.arctan2(i[2], i[1]), np.sqrt(i[1] ** 2 + i[2] ** 2), i[0]] for i in jab]
+    )
+    return " ".join(np.array(row)[np.lexsort(hcl[:, ::-1].T)])
+
+
+def random_rows(num_rows=20, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        ["%06x" % c for c in rng.integers(0, 2 ** 24, rng.integers(2, 6))]
+        for _ in range(num_rows)
+    ]
+
+
+def test_sort_block():
+    rows = random_rows()
+    # Repeated colors within a set
+    rows.append(["ff0000", "00ff00", "ff0000", "0000ff"])
+    expected = "".join(reference_sort(row) + "\n" for row in rows)
+    assert to_hcl.sort_block(rows) == expected
+
+
+def test_read_blocks():
+    lines = ["a b\n", "\n", "c d e\n", "f\n", "  \n", "g h\n"]
+    assert list(to_hcl.read_blocks(iter(lines), 2)) == [
+        [["a", "b"]],
+        [["c", "d", "e"], ["f"]],
+        [["g", "h"]],
+    ]
+
+
+@pytest.mark.parametrize("num_jobs", [1, 2])
+def test_main(tmp_path, monkeypatch, num_jobs):
+    rows = random_rows(50, seed=1)
+    header = ["# header 1\n", "# header 2\n", "# header 3\n"]
+    monkeypatch.chdir(tmp_path)
+    with open("sets.txt", "w") as outfile:
+        outfile.writelines(header)
+        outfile.writelines(" ".join(row) + "\n" for row in rows)
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["to_hcl.py", "sets.txt", "--block-size", "7", "--num-jobs", str(num_jobs)],
+    )
+    to_hcl.main()
+    with open("sets_hcl_sorted.txt") as infile:
+        lines = infile.readlines()
+    assert lines[:3] == header
+    assert lines[3].startswith("# Python ")
+    assert lines[5:] == [reference_sort(row) + "\n" for row in rows]
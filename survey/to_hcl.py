@@ -22,41 +22,121 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
 import argparse
-import csv
+import collections
+import itertools
+import multiprocessing
+import os
 import platform
+import sys
 import numpy as np
 import colorspacious
 
-parser = argparse.ArgumentParser(
-    description="Sort color sets by HCL (hue, chroma, luminance) [CAM02-UCS based].",
-    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+# Hex color codes are parsed and converted to CAM02-UCS in the same way as for
+# the aesthetic models
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "aesthetic-models",
+        "numpy-version",
+    )
 )
-parser.add_argument(
-    "input", metavar="INPUT", help="Color sets to be sorted (space separated)"
-)
-args = parser.parse_args()
-
-with open(args.input) as csv_file:
-    with open(args.input.split(".")[0] + "_hcl_sorted.txt", "w") as outfile:
-        # Copy header rows
-        outfile.write(csv_file.readline())
-        outfile.write(csv_file.readline())
-        outfile.write(csv_file.readline())
-        # Record environment
-        outfile.write("# Python " + platform.sys.version.replace("\n", "") + "\n")
-        outfile.write(
-            f"# NumPy {np.__version__}, Colorspacious {colorspacious.__version__}\n"
-        )
-        csv_reader = csv.reader(csv_file, delimiter=" ")
-        for row in csv_reader:
-            row = [i.strip() for i in row]
-            rgb = [(int(i[:2], 16), int(i[2:4], 16), int(i[4:], 16)) for i in row]
-            jab = [colorspacious.cspace_convert(i, "sRGB255", "CAM02-UCS") for i in rgb]
-            hcl = np.array(
-                [
-                    [np.arctan2(i[2], i[1]), np.sqrt(i[1] ** 2 + i[2] ** 2), i[0]]
-                    for i in jab
-                ]
+from numpy_model import JabCache, hex_to_rgb
+
+
+def sort_by_hcl(colors, jab_cache):
+    """
+    Sorts colors in each set by hue, then chroma, then lightness; colors are hex
+    color codes with shape=(num_sets, num_colors).
+    """
+    jab = jab_cache(hex_to_rgb(colors))
+    hue = np.arctan2(jab[..., 2], jab[..., 1])
+    chroma = np.sqrt(jab[..., 1] ** 2 + jab[..., 2] ** 2)
+    idx = np.lexsort((jab[..., 0], chroma, hue), axis=-1)
+    return np.take_along_axis(colors, idx, axis=-1)
+
+
+def read_blocks(infile, block_size):
+    """
+    Reads blocks of up to `block_size` color sets, as lists of hex color codes,
+    skipping blank lines.
+    """
+    while True:
+        lines = list(itertools.islice(infile, block_size))
+        if len(lines) == 0:
+            return
+        rows = [line.split() for line in lines if line.strip()]
+        if len(rows) > 0:
+            yield rows
+
+
+# Each process keeps its own cache of converted colors, which has a size limit to
+# keep memory use bounded
+JAB_CACHE = JabCache()
+
+
+def sort_block(rows):
+    """
+    Sorts a block of color sets and formats them as lines of output. Sets with
+    different numbers of colors are sorted separately and written in input order.
+    """
+    lengths = np.array([len(row) for row in rows])
+    lines = np.empty(len(rows), dtype=object)
+    for length in np.unique(lengths):
+        idx = np.flatnonzero(lengths == length)
+        colors = np.array([rows[i] for i in idx])
+        lines[idx] = [" ".join(row) for row in sort_by_hcl(colors, JAB_CACHE)]
+    return "".join(line + "\n" for line in lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sort color sets by HCL (hue, chroma, luminance) "
+        + "[CAM02-UCS based].",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "input", metavar="INPUT", help="Color sets to be sorted (space separated)"
+    )
+    parser.add_argument(
+        "--block-size", default=10000, type=int, help="Number of color sets per block"
+    )
+    parser.add_argument(
+        "--num-jobs", default=1, type=int, help="Number of parallel jobs to use"
+    )
+    args = parser.parse_args()
+
+    # The input is read and sorted in blocks of color sets, which are written in
+    # input order. With multiple jobs, blocks are sorted by a pool of worker
+    # processes, with a bounded window of blocks in flight, so memory use does
+    # not depend on the size of the input.
+    window_size = 2 * args.num_jobs
+
+    with open(args.input) as csv_file:
+        with open(args.input.split(".")[0] + "_hcl_sorted.txt", "w") as outfile:
+            # Copy header rows
+            outfile.write(csv_file.readline())
+            outfile.write(csv_file.readline())
+            outfile.write(csv_file.readline())
+            # Record environment
+            outfile.write("# Python " + platform.sys.version.replace("\n", "") + "\n")
+            outfile.write(
+                f"# NumPy {np.__version__}, Colorspacious {colorspacious.__version__}\n"
             )
-            new_row = " ".join(np.array(row)[np.lexsort(hcl[:, ::-1].T)])
-            outfile.write(new_row + "\n")
+            blocks = read_blocks(csv_file, args.block_size)
+            if args.num_jobs == 1:
+                for block in blocks:
+                    outfile.write(sort_block(block))
+            else:
+                pending = collections.deque()
+                with multiprocessing.Pool(args.num_jobs) as pool:
+                    for block in blocks:
+                        if len(pending) == window_size:
+                            outfile.write(pending.popleft().get())
+                        pending.append(pool.apply_async(sort_block, (block,)))
+                    while len(pending) > 0:
+                        outfile.write(pending.popleft().get())
+
+
+if __name__ == "__main__":
+    main()